@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -26,6 +27,19 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Background image hashing
+    from .hash_worker import hash_worker
+    hash_worker.init_app(app)
+
+    # Resized copies of static/uploads for cards and grids
+    from .app.thumbnails import init_app as init_thumbnails
+    init_thumbnails(app, os.path.join(app.root_path, 'static', 'uploads'),
+                    os.getenv('THUMB_CACHE_DIR', os.path.join(app.instance_path, 'thumbs')))
+
+    # Rendered post cards reused across requests
+    from .caching import init_app as init_caching
+    init_caching(app)
+
     # Register blueprints
     from .views import views
     from .auth import auth
@@ -51,6 +65,14 @@ def create_app():
             db.session.add(admin)
             db.session.commit()
 
+        # Post change log, followed by the duplicate detection index
+        from .app.search.changes import install_change_log
+        install_change_log(db.engine)
+
+        # User edit counter, part of the public pages' ETags
+        from .caching import install_site_counters
+        install_site_counters(db.engine)
+
 
     login_manager = LoginManager()
     login_manager.login_view = "auth.login"
@@ -22,6 +22,12 @@ def create_app(config_object=None):
         SQLALCHEMY_DATABASE_URI=os.getenv('DATABASE_URL', default_db_uri),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         UPLOAD_FOLDER=os.path.abspath(os.path.join(app.root_path, 'static', 'uploads')),
+        HASH_STORE_DIR=os.getenv('HASH_STORE_DIR', os.path.join(app.instance_path, 'hash_store')),
+        SEARCH_CACHE_SIZE=int(os.getenv('SEARCH_CACHE_SIZE', 256)),
+        SEARCH_CACHE_TTL=int(os.getenv('SEARCH_CACHE_TTL', 300)),
+        SEARCH_IMAGE_WEIGHT=float(os.getenv('SEARCH_IMAGE_WEIGHT', 0.6)),
+        SEARCH_TOP_K=int(os.getenv('SEARCH_TOP_K', 50)),
+        THUMB_CACHE_DIR=os.getenv('THUMB_CACHE_DIR', os.path.join(app.instance_path, 'thumbs')),
     )
 
     #Bind SQLAlchemy db object to Flask app
@@ -32,5 +38,32 @@ def create_app(config_object=None):
     from .search import bp as search_bp
     app.register_blueprint(search_bp, url_prefix='/search')
 
+    # Thumbnails of the uploads served at /thumbs/<size>/<filename>
+    from .thumbnails import init_app as init_thumbnails
+    init_thumbnails(app, app.config['UPLOAD_FOLDER'], app.config['THUMB_CACHE_DIR'])
+
+    # Triggers that record post changes for the in-memory search indexes
+    from .search.changes import install_change_log
+    from .search.fts import install_fts
+    from .search.hash_index import hash_index
+    hash_index.configure(app.config['HASH_STORE_DIR'])
+
+    # Result cache, invalidated through the same change log
+    from .search.cache import result_cache
+    result_cache.configure(app.config['SEARCH_CACHE_SIZE'], app.config['SEARCH_CACHE_TTL'])
+    with app.app_context():
+        try:
+            install_change_log(db.engine)
+        except Exception as e:
+            app.logger.warning(f"Could not install post change log: {e}")
+
+        # Full-text index; searches fall back to ilike if FTS5 is missing
+        try:
+            install_fts(db.engine)
+            app.config['SEARCH_FTS'] = True
+        except Exception as e:
+            app.config['SEARCH_FTS'] = False
+            app.logger.warning(f"Full-text search disabled: {e}")
+
     #Return Flask app
     return app
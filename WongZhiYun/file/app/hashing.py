@@ -0,0 +1,97 @@
+"""
+Image hashing helpers shared by the search service and the main site.
+Nothing here touches the database, so either app can import it.
+
+Besides the pHash in post.image_hash, every image gets a few more compact
+fingerprints (dHash, aHash, wHash and a 64-bin colour histogram) stored as
+JSON in post.image_fingerprints. They are too expensive to scan, but cheap
+enough to re-rank the few hundred candidates the pHash index returns.
+"""
+import json
+
+import imagehash
+import numpy as np
+from PIL import Image
+
+# Relative weight of each fingerprint in fingerprint_similarity
+FINGERPRINT_WEIGHTS = {'phash': 0.35, 'dhash': 0.2, 'ahash': 0.1, 'whash': 0.15, 'hist': 0.2}
+HIST_LEVELS = 4  # per channel -> 4 * 4 * 4 = 64 bins
+
+
+def compute_image_hash(image_source):
+    # Compute perceptual hash (pHash) for an image path or file object
+    img = Image.open(image_source).convert('RGB')
+    h = imagehash.phash(img)
+    return str(h)
+
+
+def color_histogram(img):
+    # 64-bin RGB histogram, each bin quantised to one byte, as hex
+    small = np.asarray(img.resize((64, 64)), dtype=np.uint8) // (256 // HIST_LEVELS)
+    bins = (small[..., 0] * HIST_LEVELS + small[..., 1]) * HIST_LEVELS + small[..., 2]
+    counts = np.bincount(bins.ravel(), minlength=HIST_LEVELS ** 3)
+    return np.round(counts * 255.0 / counts.sum()).astype(np.uint8).tobytes().hex()
+
+
+def compute_fingerprints(image_source):
+    # Decode once and compute every fingerprint; 'phash' goes to post.image_hash
+    img = Image.open(image_source).convert('RGB')
+    return {
+        'phash': str(imagehash.phash(img)),
+        'dhash': str(imagehash.dhash(img)),
+        'ahash': str(imagehash.average_hash(img)),
+        'whash': str(imagehash.whash(img)),
+        'hist': color_histogram(img),
+    }
+
+
+def dump_fingerprints(fingerprints):
+    # JSON for post.image_fingerprints (the pHash is stored separately)
+    return json.dumps({k: v for k, v in fingerprints.items() if k != 'phash'}, sort_keys=True)
+
+
+def load_fingerprints(image_hash, image_fingerprints):
+    # Rebuild the fingerprint dict from the two post columns
+    try:
+        fingerprints = json.loads(image_fingerprints) if image_fingerprints else {}
+    except ValueError:
+        fingerprints = {}
+    if image_hash:
+        fingerprints['phash'] = image_hash
+    return fingerprints
+
+
+def _hex_similarity(a, b):
+    if len(a) != len(b):
+        return None
+    try:
+        distance = bin(int(a, 16) ^ int(b, 16)).count('1')
+    except ValueError:
+        return None
+    return 1.0 - distance / (len(a) * 4)
+
+
+def _hist_similarity(a, b):
+    # Histogram intersection of two quantised histograms
+    try:
+        ha, hb = bytes.fromhex(a), bytes.fromhex(b)
+    except ValueError:
+        return None
+    if len(ha) != len(hb) or not sum(ha):
+        return None
+    return sum(min(x, y) for x, y in zip(ha, hb)) / max(sum(ha), sum(hb))
+
+
+def fingerprint_similarity(query, candidate):
+    # Weighted mean similarity (0..1) over the fingerprints both images have
+    total = weight = 0.0
+    for name, w in FINGERPRINT_WEIGHTS.items():
+        a, b = query.get(name), candidate.get(name)
+        if not a or not b:
+            continue
+        sim = _hist_similarity(a, b) if name == 'hist' else _hex_similarity(a, b)
+        if sim is None:
+            continue
+        total += w * sim
+        weight += w
+    return total / weight if weight else 0.0
@@ -17,6 +17,7 @@ class Report(db.Model):
     user_id = db.Column(db.Integer)                    # ID of the posting user
     is_approved = db.Column(db.Boolean, default=False) # Whether the report is approved
     image_hash = db.Column(db.Text)                    # to prevent duplicate uploads
+    image_fingerprints = db.Column(db.Text)            # JSON: dHash/aHash/wHash/colour histogram for re-ranking
 
     def __repr__(self):
         # Representation string for debugging
@@ -1,26 +1,39 @@
 import os
-from flask import Blueprint, request, render_template, current_app, url_for, jsonify
-from werkzeug.utils import secure_filename
-from PIL import Image
+from flask import Blueprint, request, render_template, current_app, url_for, jsonify, make_response, stream_with_context
+from sqlalchemy import false, select
 import imagehash
 
-from app import db
-from app.models import Report
+from .. import db
+from ..hashing import fingerprint_similarity, load_fingerprints
+from ..models import Report
+from .cache import result_cache, result_key
+from .changes import current_seq
+from .fts import bm25_score, fts_match_query, fts_subquery
+from .hash_index import hash_index
+from .pagination import count_cache, decode_cursor, encode_cursor, keyset_page, newest_first, posted_text
+from .query_hash import hash_query_image, query_hash_cache
+from .scoring import ScoringEngine
+from .text_index import text_index
 
 # Define a Blueprint for search-related features
 bp = Blueprint('search', __name__, template_folder='templates')
 
+# How many pHash neighbours get re-ranked with the full fingerprints
+RERANK_CANDIDATES = 300
+
+# search_api page sizes, and rows fetched per batch when streaming NDJSON
+API_PAGE_SIZE = 200
+API_MAX_PAGE_SIZE = 1000
+API_STREAM_BATCH = 500
+
+# Text matches considered by combined_search before scoring
+COMBINED_TEXT_CANDIDATES = 1000
+
 # ---------- helpers ----------
 def get_upload_folder():
     # Get upload folder
     return current_app.config.get('UPLOAD_FOLDER', os.path.abspath(os.path.join(current_app.root_path, 'static', 'uploads')))
 
-def compute_image_hash(image_path):
-    # Compute perceptual hash (pHash) for an image
-    img = Image.open(image_path).convert('RGB')
-    h = imagehash.phash(img)
-    return str(h)
-
 def hamming_distance_hex(hash_hex1, hash_hex2):
      # Compute Hamming distance between two image hashes
     if not hash_hex1 or not hash_hex2:
@@ -43,6 +56,12 @@ def image_similarity_from_distance(distance, hash_hex):
     sim = max(0.0, 1.0 - (distance / bits))
     return sim
 
+def image_score(query_fp, report, distance):
+    # Re-rank score from all fingerprints, falling back to the pHash distance alone
+    if report.image_fingerprints:
+        return fingerprint_similarity(query_fp, load_fingerprints(report.image_hash, report.image_fingerprints))
+    return image_similarity_from_distance(distance, query_fp['phash'])
+
 def simple_text_score(item, q):
     # Simple text matching score (title/description/location)
     if not q:
@@ -57,9 +76,109 @@ def simple_text_score(item, q):
         score += 0.2
     return min(score, 1.0)
 
-def combine_scores(text_score, image_score, alpha=0.6):
-    # Combine text & image scores, alpha weights image more
-    return alpha * image_score + (1 - alpha) * text_score
+def text_search(query, q):
+    # Restrict query to reports matching q. Returns (query, rank): rank is the
+    # BM25 column to order by, or None when FTS5 is unavailable (ilike fallback)
+    if current_app.config.get('SEARCH_FTS'):
+        if not fts_match_query(q):
+            return query.filter(false()), None
+        fts = fts_subquery(q)
+        return query.join(fts, fts.c.id == Report.id), fts.c.rank
+    like_q = f"%{q}%"
+    return query.filter(
+        (Report.title.ilike(like_q)) |
+        (Report.description.ilike(like_q)) |
+        (Report.location.ilike(like_q))
+    ), None
+
+def text_score_for(report, rank, q):
+    return bm25_score(rank) if rank is not None else simple_text_score(report, q)
+
+def cache_lookup(key, generation=None):
+    # Cached response for key, if any. Returns (generation, response or None);
+    # the generation is the change log position the entry must match
+    if generation is None:
+        try:
+            generation = current_seq(db.session)
+        except Exception:
+            db.session.rollback()   # no change log: entries expire by TTL only
+            generation = None
+    hit = result_cache.get(key, generation)
+    if hit is None:
+        return generation, None
+    body, mimetype = hit
+    return generation, current_app.response_class(body, mimetype=mimetype)
+
+def cache_store(key, generation, rv):
+    # Store a freshly built response body and return it as a response
+    response = make_response(rv)
+    result_cache.put(key, generation, response.get_data(), response.mimetype)
+    return response
+
+def api_hits(q, category, key, limit=None):
+    # (doc, raw score) pairs from the text index, continuing after cursor key
+    if q:
+        after = key if key and isinstance(key[0], (int, float)) else None
+        return text_index.search(q, category, limit=limit, after=after)
+    before = key if key and isinstance(key[0], str) else None
+    return [(doc, 0.0) for doc in text_index.latest(category, limit=limit, before=before)]
+
+def hit_cursor(q, doc, score):
+    # Cursor key of one search_api hit, matching the api_hits ordering
+    return [score, doc['id']] if q else [doc['date_posted'] or '', doc['id']]
+
+def api_row(doc, score, image_prefix):
+    # One search_api result; image_prefix is url_for('static', filename='uploads/')
+    return {
+        'id': doc['id'],
+        'title': doc['title'],
+        'category': doc['category'],
+        'location': doc['location'],
+        'image': image_prefix + doc['image'] if doc['image'] else None,
+        'text_score': score / (1.0 + score),
+        'image_hash': doc['image_hash']
+    }
+
+def catalogue_batches(stmt, key):
+    # Rows of a newest-first select, API_STREAM_BATCH at a time. Each batch is
+    # its own keyset query and the session is closed straight after, so a slow
+    # client never holds a read transaction (and SQLite's lock) between batches
+    stmt = stmt.add_columns(posted_text().label('posted'))
+    while True:
+        batch = db.session.execute(newest_first(stmt, key).limit(API_STREAM_BATCH)).all()
+        db.session.close()
+        yield from batch
+        if len(batch) < API_STREAM_BATCH:
+            return
+        key = [batch[-1].posted, batch[-1].id]
+
+def stream_api_rows(q, category, cursor):
+    # NDJSON response. Keyword matches come from the text index; the full
+    # catalogue is read in keyset batches, so memory stays flat however many
+    # reports there are
+    key = decode_cursor(cursor)
+    image_prefix = url_for('static', filename='uploads/')
+    dumps = current_app.json.dumps
+
+    if q:
+        rows = (api_row(doc, score, image_prefix) for doc, score in api_hits(q, category, key))
+    else:
+        stmt = select(Report.id, Report.title, Report.category, Report.location,
+                      Report.image, Report.image_hash).where(Report.is_approved == True)
+        if category:
+            stmt = stmt.where(Report.category == category)
+        rows = (api_row(row._mapping, 0.0, image_prefix) for row in catalogue_batches(stmt, key))
+
+    def generate():
+        for row in rows:
+            yield dumps(row) + '\n'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def scoring_engine():
+    # Engine with the configured weights (SEARCH_IMAGE_WEIGHT) and result count
+    alpha = current_app.config.get('SEARCH_IMAGE_WEIGHT', 0.6)
+    return ScoringEngine({'text': 1.0 - alpha, 'image': alpha}, k=current_app.config.get('SEARCH_TOP_K', 50))
 
 # ---------- routes ----------
 @bp.route('/', methods=['GET'])
@@ -67,64 +186,68 @@ def search_page():
     # Search page (keyword/category filter, returns HTML)
     q = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
-    page = max(1, int(request.args.get('page', 1)))
+    cursor = request.args.get('cursor')
     per_page = 10
 
+    key = result_key('page', q, category, cursor)
+    generation, cached = cache_lookup(key)
+    if cached is not None:
+        return cached
+
     query = Report.query.filter(Report.is_approved == True)
 
     if category:
         query = query.filter(Report.category == category)
 
+    rank = None
     if q:
-        like_q = f"%{q}%"
-        query = query.filter(
-            (Report.title.ilike(like_q)) |
-            (Report.description.ilike(like_q)) |
-            (Report.location.ilike(like_q))
-        )
+        query, rank = text_search(query, q)
 
-    total = query.count()
-    results = query.order_by(Report.date_posted.desc()).offset((page-1)*per_page).limit(per_page).all()
+    # Rows come back already in global rank order; the cursor replaces OFFSET
+    total = count_cache.get_or_count((q.lower(), category), query)
+    results, next_cursor = keyset_page(query, rank, per_page, cursor)
 
     scored = []
-    for r in results:
-        ts = simple_text_score(r, q)
+    for r, rk in results:
+        ts = text_score_for(r, rk, q)
         scored.append({'report': r, 'text_score': ts, 'image_score': 0.0, 'final_score': ts})
 
-    scored_sorted = sorted(scored, key=lambda x: x['final_score'], reverse=True)
-    return render_template('search/results.html', results=scored_sorted, q=q, category=category, page=page, total=total)
+    return cache_store(key, generation, render_template(
+        'search/results.html', results=scored, q=q, category=category,
+        total=total, next_cursor=next_cursor))
 
 @bp.route('/api', methods=['GET'])
 def search_api():
-    # Provide JSON search results (for API use)
+    # Provide JSON search results (for API use).
+    # ?cursor= continues after the previous page; ?format=ndjson streams the
+    # whole match set one JSON object per line
     q = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
-    query = Report.query.filter(Report.is_approved == True)
+    cursor = request.args.get('cursor')
+    limit = min(max(1, request.args.get('limit', API_PAGE_SIZE, type=int)), API_MAX_PAGE_SIZE)
+    stream = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
 
-    if category:
-        query = query.filter(Report.category == category)
-    if q:
-        like_q = f"%{q}%"
-        query = query.filter(
-            (Report.title.ilike(like_q)) |
-            (Report.description.ilike(like_q)) |
-            (Report.location.ilike(like_q))
-        )
-
-    results = query.order_by(Report.date_posted.desc()).limit(200).all()
-    data = []
-    for r in results:
-        ts = simple_text_score(r, q)
-        data.append({
-            'id': r.id,
-            'title': r.title,
-            'category': r.category,
-            'location': r.location,
-            'image': url_for('static', filename='uploads/' + (r.image or '')) if r.image else None,
-            'text_score': ts,
-            'image_hash': r.image_hash
-        })
-    return jsonify({'results': data})
+    # Answered from the in-memory text index; SQLite is only polled for
+    # changes once every TextIndex.SYNC_INTERVAL seconds
+    text_index.sync(db.session)
+    if stream:
+        return stream_api_rows(q, category, cursor)
+
+    key = result_key(f'api:{limit}', q, category, cursor)
+    generation, cached = cache_lookup(key, text_index.generation)
+    if cached is not None:
+        return cached
+
+    hits = api_hits(q, category, decode_cursor(cursor), limit + 1)
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_cursor(hit_cursor(q, *hits[-1]))
+
+    image_prefix = url_for('static', filename='uploads/')
+    data = [api_row(doc, score, image_prefix) for doc, score in hits]
+    return cache_store(key, generation, jsonify({'results': data, 'next_cursor': next_cursor}))
 
 @bp.route('/by-image', methods=['POST'])
 def search_by_image():
@@ -135,27 +258,24 @@ def search_by_image():
     if file.filename == '':
         return "No selected file", 400
 
-    filename = secure_filename(file.filename)
-    upload_folder = get_upload_folder()
-    os.makedirs(upload_folder, exist_ok=True)
-    saved_path = os.path.join(upload_folder, filename)
-    file.save(saved_path)
-
     try:
-        query_hash = compute_image_hash(saved_path)
+        query_fp = hash_query_image(file)
     except Exception as e:
         current_app.logger.error(f"Hash compute error: {e}")
         return "Error processing image", 500
 
-    candidates = Report.query.filter(Report.is_approved == True).all()
+    # Stage 1: pHash neighbours from the packed hash index (one vectorised scan)
+    hash_index.sync(db.session)
+    matches = hash_index.nearest(query_fp['phash'], RERANK_CANDIDATES)
+    reports = {r.id: r for r in Report.query.filter(Report.id.in_([rid for rid, _ in matches])).all()} if matches else {}
+
+    # Stage 2: re-rank only those candidates with the richer fingerprints
     scored = []
-    for r in candidates:
-        if not r.image_hash:
-            distance = None
-            img_score = 0.0
-        else:
-            distance = hamming_distance_hex(query_hash, r.image_hash)
-            img_score = image_similarity_from_distance(distance, query_hash)
+    for rid, distance in matches:
+        r = reports.get(rid)
+        if r is None:
+            continue
+        img_score = image_score(query_fp, r, distance)
         scored.append({'report': r, 'image_distance': distance, 'image_score': img_score, 'text_score': 0.0, 'final_score': img_score})
 
     scored_sorted = sorted(scored, key=lambda x: x['final_score'], reverse=True)[:20]
@@ -166,44 +286,66 @@ def combined_search():
     # Combined text + image search
     q = request.form.get('q', '').strip()
     category = request.form.get('category', '').strip()
-    alpha = 0.6 
+    engine = scoring_engine()
+    alpha = request.form.get('alpha', type=float)
+    if alpha is not None:
+        engine = engine.with_weights(text=1.0 - min(max(alpha, 0.0), 1.0), image=min(max(alpha, 0.0), 1.0))
 
-    query_hash = None
+    query_fp = None
     if 'file' in request.files and request.files['file'].filename != '':
-        file = request.files['file']
-        filename = secure_filename(file.filename)
-        upload_folder = get_upload_folder()
-        os.makedirs(upload_folder, exist_ok=True)
-        saved_path = os.path.join(upload_folder, filename)
-        file.save(saved_path)
         try:
-            query_hash = compute_image_hash(saved_path)
+            query_fp = hash_query_image(request.files['file'])
         except Exception as e:
             current_app.logger.error(f"Hash compute error: {e}")
-            query_hash = None
+            query_fp = None
 
-    query = Report.query.filter(Report.is_approved == True)
-    if category:
-        query = query.filter(Report.category == category)
+    # Candidates: best text matches plus nearest pHash neighbours, both from
+    # the in-memory indexes (not just the newest rows)
+    text_index.sync(db.session)
+    text_scores = {}
     if q:
-        like_q = f"%{q}%"
-        query = query.filter(
-            (Report.title.ilike(like_q)) |
-            (Report.description.ilike(like_q)) |
-            (Report.location.ilike(like_q))
-        )
-
-    candidates = query.order_by(Report.date_posted.desc()).limit(200).all()
-    scored = []
-    for r in candidates:
-        ts = simple_text_score(r, q) if q else 0.0
-        if query_hash and r.image_hash:
-            distance = hamming_distance_hex(query_hash, r.image_hash)
-            iscore = image_similarity_from_distance(distance, query_hash)
-        else:
-            iscore = 0.0
-        final = combine_scores(ts, iscore, alpha=alpha)
-        scored.append({'report': r, 'text_score': ts, 'image_score': iscore, 'final_score': final})
-
-    scored_sorted = sorted(scored, key=lambda x: x['final_score'], reverse=True)
-    return render_template('search/results.html', results=scored_sorted, q=q, category=category)
+        text_scores = {doc['id']: s / (1.0 + s) for doc, s in
+                       text_index.search(q, category, limit=COMBINED_TEXT_CANDIDATES)}
+    distances = {}
+    if query_fp:
+        hash_index.sync(db.session)
+        distances = dict(hash_index.nearest(query_fp['phash'], RERANK_CANDIDATES))
+    if not q and not query_fp:
+        text_scores = {doc['id']: 0.0 for doc in text_index.latest(category, limit=COMBINED_TEXT_CANDIDATES)}
+
+    # Only approved reports in the requested category (the text index holds exactly those)
+    ids = [rid for rid in dict.fromkeys([*text_scores, *distances])
+           if rid in text_index.docs and (not category or text_index.docs[rid]['category'] == category)]
+    if query_fp:
+        distances.update(hash_index.distances(query_fp['phash'], [rid for rid in ids if rid not in distances]))
+
+    # Stage 1: vectorised text + pHash scores, keep a shortlist
+    signals = {'text': [text_scores.get(rid, 0.0) for rid in ids]}
+    if query_fp:
+        # Same pHash scale as image_score; one conversion per distinct distance
+        similarity = {d: image_similarity_from_distance(d, query_fp['phash']) for d in set(distances.values())}
+        signals['image'] = [similarity[distances[rid]] if rid in distances else 0.0 for rid in ids]
+    shortlist = engine.top_k(ids, signals, k=engine.k * 3 if query_fp else engine.k)
+
+    # Stage 2: re-score the shortlist's images with the full fingerprints
+    reports = {r.id: r for r in Report.query.filter(Report.id.in_([rid for rid, _, _ in shortlist]))} if shortlist else {}
+    ids = [rid for rid, _, _ in shortlist if rid in reports]
+    signals = {'text': [text_scores.get(rid, 0.0) for rid in ids]}
+    if query_fp:
+        signals['image'] = [image_score(query_fp, reports[rid], distances[rid]) if rid in distances else 0.0
+                            for rid in ids]
+    results = [
+        {'report': reports[rid], 'text_score': parts['text'], 'image_score': parts.get('image', 0.0), 'final_score': final}
+        for rid, final, parts in engine.top_k(ids, signals)
+    ]
+    return render_template('search/results.html', results=results, q=q, category=category)
+
+@bp.route('/stats', methods=['GET'])
+def search_stats():
+    # Cache and index counters (JSON, for monitoring)
+    return jsonify({
+        'query_hash_cache': query_hash_cache.stats(),
+        'result_cache': result_cache.stats(),
+        'hash_index': {'size': len(hash_index)},
+        'text_index': {'size': len(text_index), 'generation': text_index.generation},
+    })
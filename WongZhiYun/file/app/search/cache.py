@@ -0,0 +1,115 @@
+"""
+Cache of rendered search results.
+
+Popular queries are answered from a bounded LRU of response bodies keyed by
+(endpoint, normalised query, category, cursor). Every entry also has a TTL.
+The whole cache is dropped as soon as the post change log moves past the
+position the entries were built at, i.e. when the main site approves, closes,
+edits or deletes a post, so a cached page is never staler than the last change
+it could have seen.
+
+Dropping everything is deliberate. Finding the entries one post change
+affects would mean re-running every cached query (a new report can enter any
+keyword, category or cursor page), which costs more than rebuilding the few
+pages that are actually requested again. Posts change rarely compared with
+searches, so the cache serves the bursts of reads between writes; while the
+site is being edited continuously its hit rate falls towards zero, and
+maxsize and the TTL keep that case bounded.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+def result_key(kind, q, category, cursor=None):
+    # Case and whitespace differences map to the same entry
+    return (kind, ' '.join((q or '').lower().split()), category or '', cursor or '')
+
+
+class ResultCache:
+    # Bounded LRU: key -> (body, mimetype), cleared when the generation changes
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (body, mimetype, expires)
+        self._bytes = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, maxsize=None, ttl=None):
+        if maxsize is not None:
+            self.maxsize = maxsize
+        if ttl is not None:
+            self.ttl = ttl
+
+    def _check_generation(self, generation):
+        # Called with the lock held; None means "unknown", rely on the TTL.
+        # Returns False for a caller that has not seen the latest changes yet.
+        if generation is None:
+            return True
+        if self._generation is None or generation > self._generation:
+            if self._generation is not None and self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+            self._generation = generation
+            return True
+        return generation == self._generation
+
+    def get(self, key, generation):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key) if self._check_generation(generation) else None
+            if entry is None or entry[2] <= now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, generation, body, mimetype):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if not self._check_generation(generation):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, mimetype, time.monotonic() + self.ttl)
+            self._bytes += len(body)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def _drop(self, key):
+        body = self._entries.pop(key)[0]
+        self._bytes -= len(body)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'generation': self._generation,
+            }
+
+
+result_cache = ResultCache()
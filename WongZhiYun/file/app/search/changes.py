@@ -0,0 +1,123 @@
+"""
+Change log for the post table.
+
+Posts are created, approved and deleted by the main site, which runs in a
+different process from the search service. SQLite triggers append the id of
+every touched post to ``post_changes`` no matter who made the change, so the
+in-memory search indexes can replay just the new entries (a primary key range
+scan) instead of reloading the whole table.
+
+Each named consumer records how far it has read in ``post_change_readers``
+every few minutes and then deletes the entries every live consumer has
+already read, so the log stays short. A consumer that was away long enough
+for its entries to be pruned notices the gap and reloads in full.
+"""
+import os
+import socket
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+CHANGE_LOG_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS post_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        post_id INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_changes_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_changes (post_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_changes_au AFTER UPDATE ON post BEGIN
+        INSERT INTO post_changes (post_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_changes_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_changes (post_id) VALUES (old.id);
+    END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS post_change_readers (
+        reader TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        seen_at REAL NOT NULL
+    )
+    """,
+]
+
+
+def install_change_log(engine):
+    # Create the change log table and its triggers (safe to run on every start)
+    with engine.begin() as conn:
+        for ddl in CHANGE_LOG_DDL:
+            conn.execute(text(ddl))
+
+
+def current_seq(conn):
+    # Latest sequence number in the change log (0 when empty)
+    return conn.execute(text("SELECT COALESCE(MAX(seq), 0) FROM post_changes")).scalar()
+
+
+def prune_change_log(engine, reader, seq, stale_after):
+    # Record `reader` at `seq`, forget readers not seen for `stale_after`
+    # seconds and delete the entries below the lowest position left. The entry
+    # at that position is kept, so MAX(seq) never goes back.
+    # Returns the number of entries deleted.
+    now = time.time()
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO post_change_readers (reader, seq, seen_at) VALUES (:reader, :seq, :now) "
+                "ON CONFLICT (reader) DO UPDATE SET seq = excluded.seq, seen_at = excluded.seen_at"
+            ), {'reader': reader, 'seq': seq, 'now': now})
+            conn.execute(text("DELETE FROM post_change_readers WHERE seen_at < :stale"),
+                         {'stale': now - stale_after})
+            return conn.execute(text(
+                "DELETE FROM post_changes WHERE seq < (SELECT MIN(seq) FROM post_change_readers)"
+            )).rowcount
+    except OperationalError:
+        return 0    # database busy, try again next time
+
+
+class ChangeFeed:
+    # Remembers how far one consumer has read the change log.
+    # A named feed also takes part in pruning it (see prune_change_log).
+
+    PRUNE_INTERVAL = 300        # seconds between position updates / prunes
+    READER_TTL = 24 * 3600      # readers silent for this long no longer hold entries back
+
+    def __init__(self, name=None):
+        self.last_seq = None
+        self.reader = f"{name}@{socket.gethostname()}:{os.getpid()}" if name else None
+        self._last_pruned = time.monotonic()
+
+    @property
+    def started(self):
+        return self.last_seq is not None
+
+    def start(self, conn):
+        # Mark the current end of the log; call before loading a full snapshot
+        self.last_seq = current_seq(conn)
+
+    def pending(self, conn):
+        # Return the ids of posts changed since the last call and advance, or
+        # None when entries this feed never read were pruned (reload in full).
+        # `conn` is a session; pruning runs on a connection of its own.
+        first = conn.execute(text("SELECT MIN(seq) FROM post_changes")).scalar()
+        if first is not None and first > self.last_seq + 1:
+            return None
+        rows = conn.execute(
+            text("SELECT seq, post_id FROM post_changes WHERE seq > :seq ORDER BY seq"),
+            {'seq': self.last_seq},
+        ).fetchall()
+        if rows:
+            self.last_seq = rows[-1][0]
+        if self.reader and time.monotonic() - self._last_pruned > self.PRUNE_INTERVAL:
+            self._last_pruned = time.monotonic()
+            prune_change_log(conn.get_bind(), self.reader, self.last_seq, self.READER_TTL)
+        return {post_id for _, post_id in rows}
@@ -0,0 +1,87 @@
+"""
+SQLite FTS5 index over post title / description / location / category.
+
+post_fts is an external-content FTS5 table: it stores only the inverted index
+and reads column values from post. Triggers keep it in step with every insert,
+update and delete, whichever process writes. Searches match tokens (with
+prefix matching, so "wal" still finds "wallet") and are ordered by BM25.
+"""
+import re
+
+from sqlalchemy import Float, Integer, text
+
+# BM25 column weights: title, description, location, category
+BM25_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(
+        title, description, location, category,
+        content='post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts (rowid, title, description, location, category)
+        VALUES (new.id, new.title, new.description, new.location, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts (post_fts, rowid, title, description, location, category)
+        VALUES ('delete', old.id, old.title, old.description, old.location, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF title, description, location, category ON post BEGIN
+        INSERT INTO post_fts (post_fts, rowid, title, description, location, category)
+        VALUES ('delete', old.id, old.title, old.description, old.location, old.category);
+        INSERT INTO post_fts (rowid, title, description, location, category)
+        VALUES (new.id, new.title, new.description, new.location, new.category);
+    END
+    """,
+]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def install_fts(engine):
+    # Create post_fts + triggers. The index is rebuilt from post whenever the
+    # triggers were missing, since rows written before then were never indexed.
+    with engine.begin() as conn:
+        conn.execute(text("SELECT 1 FROM post LIMIT 0"))  # fail early if post is missing
+        synced = conn.execute(text(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'post_fts_a_'"
+        )).scalar() == 3
+        for ddl in FTS_DDL:
+            conn.execute(text(ddl))
+        if not synced:
+            conn.execute(text("INSERT INTO post_fts (post_fts) VALUES ('rebuild')"))
+
+
+def fts_match_query(q):
+    # User input -> FTS5 MATCH expression: every token must match as a prefix.
+    # Tokens are quoted so FTS operators typed by users are treated as text.
+    tokens = _TOKEN_RE.findall(q or '')
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def fts_subquery(q):
+    # Subquery of (id, rank) for posts matching q; lower rank = better match
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    return (
+        text(f"SELECT rowid AS id, bm25(post_fts, {weights}) AS rank "
+             "FROM post_fts WHERE post_fts MATCH :match")
+        .bindparams(match=fts_match_query(q))
+        .columns(id=Integer, rank=Float)
+        .subquery('fts')
+    )
+
+
+def bm25_score(rank):
+    # Map SQLite's negative BM25 rank onto a 0..1 text score
+    if rank is None:
+        return 0.0
+    s = max(0.0, -rank)
+    return s / (1.0 + s)
@@ -0,0 +1,283 @@
+"""
+In-memory Hamming space index over Report.image_hash.
+
+A BK-tree answers "everything within distance k" and "k nearest" queries
+while only visiting the branches that the triangle inequality allows, so an
+image query no longer parses and compares every approved report. The index is
+loaded once (or memory-mapped from the last snapshot) and then kept current
+by replaying the post change log.
+"""
+import heapq
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+from .changes import ChangeFeed, current_seq
+from .hash_store import PackedHashStore
+
+
+def parse_hash(hash_hex):
+    # Hex pHash string -> 64-bit int (None if missing, malformed or wider)
+    if not hash_hex:
+        return None
+    try:
+        value = int(hash_hex, 16)
+    except ValueError:
+        return None
+    return value if value < (1 << 64) else None
+
+
+def popcount(value):
+    return bin(value).count('1')
+
+
+class _Node:
+    __slots__ = ('value', 'ids', 'children')
+
+    def __init__(self, value):
+        self.value = value
+        self.ids = set()      # reports sharing this exact hash (empty = tombstone)
+        self.children = {}    # edge distance -> child node
+
+
+class BKTree:
+    # BK-tree keyed by integer hashes under Hamming distance
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+        self.dead_nodes = 0
+
+    def add(self, value, item_id):
+        if self.root is None:
+            self.root = _Node(value)
+            self.root.ids.add(item_id)
+            self.size += 1
+            return
+        node = self.root
+        while True:
+            d = popcount(node.value ^ value)
+            if d == 0:
+                if not node.ids:
+                    self.dead_nodes -= 1
+                node.ids.add(item_id)
+                self.size += 1
+                return
+            child = node.children.get(d)
+            if child is None:
+                child = node.children[d] = _Node(value)
+                child.ids.add(item_id)
+                self.size += 1
+                return
+            node = child
+
+    def remove(self, value, item_id):
+        node = self._find(value)
+        if node is None or item_id not in node.ids:
+            return False
+        node.ids.discard(item_id)
+        self.size -= 1
+        if not node.ids:
+            # Keep the node for routing; rebuild once tombstones dominate
+            self.dead_nodes += 1
+        return True
+
+    def _find(self, value):
+        node = self.root
+        while node is not None:
+            d = popcount(node.value ^ value)
+            if d == 0:
+                return node
+            node = node.children.get(d)
+        return None
+
+    def within(self, value, radius):
+        # All (item_id, distance) pairs with distance <= radius
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = popcount(node.value ^ value)
+            if d <= radius:
+                found.extend((item_id, d) for item_id in node.ids)
+            for edge, child in node.children.items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return found
+
+    def nearest(self, value, k):
+        # k closest (item_id, distance) pairs, closest first
+        if k <= 0:
+            return []
+        best = []  # max-heap via negated distance
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = popcount(node.value ^ value)
+            for item_id in node.ids:
+                entry = (-d, item_id)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            tau = -best[0][0] if len(best) == k else float('inf')
+            for edge, child in node.children.items():
+                if d - tau <= edge <= d + tau:
+                    stack.append(child)
+        return sorted(((item_id, -neg) for neg, item_id in best), key=lambda x: (x[1], x[0]))
+
+
+class HashIndex:
+    # Report id -> pHash index, synchronised from the post change log.
+    # Top-k and candidate scoring use the packed NumPy store; radius queries
+    # use a BK-tree that is built from the store the first time it is needed.
+    # approved_only=False also indexes pending posts (duplicate detection).
+
+    SNAPSHOT_INTERVAL = 300  # seconds between snapshot rewrites
+
+    def __init__(self, snapshot_dir=None, approved_only=True, name='hash_index'):
+        self.approved_only = approved_only
+        self._lock = threading.RLock()
+        self._feed = ChangeFeed(name)
+        self.snapshot_dir = snapshot_dir
+        self._last_saved = 0.0
+        self._dirty = False
+        self._reset()
+
+    def configure(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+
+    def _reset(self, store=None):
+        self._store = store or PackedHashStore()
+        self._tree = None
+
+    def __len__(self):
+        return len(self._store)
+
+    # ----- incremental updates -----
+    def add(self, report_id, hash_hex):
+        value = parse_hash(hash_hex)
+        with self._lock:
+            self.remove(report_id)
+            if value is None:
+                return
+            self._store.add(report_id, value)
+            if self._tree is not None:
+                self._tree.add(value, report_id)
+            self._dirty = True
+
+    def remove(self, report_id):
+        with self._lock:
+            value = self._store.remove(report_id)
+            if value is None:
+                return
+            self._dirty = True
+            if self._tree is None:
+                return
+            self._tree.remove(value, report_id)
+            if self._tree.dead_nodes > max(64, self._tree.size):
+                self._tree = None
+
+    def _ensure_tree(self):
+        if self._tree is None:
+            tree = BKTree()
+            for report_id, value in self._store.items():
+                tree.add(value, report_id)
+            self._tree = tree
+        return self._tree
+
+    # ----- queries -----
+    def within(self, hash_hex, radius):
+        value = parse_hash(hash_hex)
+        if value is None:
+            return []
+        with self._lock:
+            return sorted(self._ensure_tree().within(value, radius), key=lambda x: (x[1], x[0]))
+
+    def nearest(self, hash_hex, k):
+        value = parse_hash(hash_hex)
+        if value is None:
+            return []
+        with self._lock:
+            return self._store.nearest(value, k)
+
+    def distances(self, hash_hex, report_ids):
+        # {report_id: distance} for candidates that have an indexed hash
+        value = parse_hash(hash_hex)
+        if value is None:
+            return {}
+        with self._lock:
+            return self._store.distances(value, report_ids)
+
+    # ----- database sync -----
+    def sync(self, session):
+        # Load everything on first use, afterwards replay only changed posts
+        with self._lock:
+            if not self._feed.started:
+                if not self._load_snapshot(session):
+                    self._load_all(session)
+                    self._save_snapshot()
+                    return
+
+            changed = self._feed.pending(session)
+            if changed is None:
+                self._load_all(session)
+                self._save_snapshot()
+                return
+            if changed:
+                self._apply(session, changed)
+            if self._dirty and time.time() - self._last_saved > self.SNAPSHOT_INTERVAL:
+                self._save_snapshot()
+
+    def _load_all(self, session):
+        self._feed.start(session)
+        self._reset()
+        rows = session.execute(text(
+            "SELECT id, image_hash FROM post WHERE image_hash IS NOT NULL"
+            + (" AND is_approved = 1" if self.approved_only else "")
+        ))
+        for report_id, hash_hex in rows:
+            self.add(report_id, hash_hex)
+
+    def _apply(self, session, changed):
+        rows = session.execute(
+            text("SELECT id, image_hash, is_approved FROM post WHERE id IN :ids")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(changed)},
+        ).fetchall()
+        seen = set()
+        for report_id, hash_hex, is_approved in rows:
+            seen.add(report_id)
+            if is_approved or not self.approved_only:
+                self.add(report_id, hash_hex)
+            else:
+                self.remove(report_id)
+        for report_id in changed - seen:
+            self.remove(report_id)
+
+    def _load_snapshot(self, session):
+        # Memory-map the last snapshot and resume the change feed from it
+        if not self.snapshot_dir:
+            return False
+        store, meta = PackedHashStore.load(self.snapshot_dir)
+        if store is None or meta.get('seq', -1) > current_seq(session):
+            return False  # missing, corrupt or taken from another database
+        self._reset(store)
+        self._feed.last_seq = meta['seq']
+        self._last_saved = time.time()
+        return True
+
+    def _save_snapshot(self):
+        if not self.snapshot_dir:
+            return
+        try:
+            self._store.save(self.snapshot_dir, meta={'seq': self._feed.last_seq})
+        except OSError:
+            return
+        self._last_saved = time.time()
+        self._dirty = False
+
+
+# Shared index for the search blueprint
+hash_index = HashIndex()
@@ -0,0 +1,143 @@
+"""
+Packed uint64 store of 64-bit image hashes.
+
+Hashes live in one NumPy uint64 array with a parallel array of report ids, so
+the distance to every stored hash is a single vectorised XOR + popcount pass
+and the top-k is picked with argpartition instead of a full sort. Snapshots
+are plain .npy files that are memory-mapped back in on start-up.
+"""
+import json
+import os
+
+import numpy as np
+
+if hasattr(np, 'bitwise_count'):
+    def popcount64(values):
+        return np.bitwise_count(values)
+else:
+    # NumPy < 2.0: look up the bit count of each byte and add them up
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount64(values):
+        values = np.ascontiguousarray(values)
+        return _BYTE_BITS[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class PackedHashStore:
+    # Growable uint64 hash array + parallel report id array
+
+    def __init__(self, capacity=1024):
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._slots = {}        # report id -> position in the arrays
+        self._writable = True
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, report_id):
+        return report_id in self._slots
+
+    def get(self, report_id):
+        slot = self._slots.get(report_id)
+        return None if slot is None else int(self._hashes[slot])
+
+    # ----- updates -----
+    def _ensure_capacity(self, needed):
+        if self._writable and needed <= len(self._hashes):
+            return
+        capacity = max(needed, 2 * len(self._hashes), 1024)
+        hashes = np.zeros(capacity, dtype=np.uint64)
+        ids = np.zeros(capacity, dtype=np.int64)
+        hashes[:self._size] = self._hashes[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        # Replaces read-only memory-mapped arrays with private copies
+        self._hashes, self._ids, self._writable = hashes, ids, True
+
+    def add(self, report_id, value):
+        slot = self._slots.get(report_id)
+        if slot is None:
+            self._ensure_capacity(self._size + 1)
+            slot = self._size
+            self._size += 1
+            self._slots[report_id] = slot
+            self._ids[slot] = report_id
+        else:
+            self._ensure_capacity(self._size)
+        self._hashes[slot] = value
+
+    def remove(self, report_id):
+        # Swap the last entry into the freed slot; returns the removed hash
+        slot = self._slots.pop(report_id, None)
+        if slot is None:
+            return None
+        self._ensure_capacity(self._size)
+        value = int(self._hashes[slot])
+        last = self._size - 1
+        if slot != last:
+            moved_id = int(self._ids[last])
+            self._hashes[slot] = self._hashes[last]
+            self._ids[slot] = moved_id
+            self._slots[moved_id] = slot
+        self._size = last
+        return value
+
+    def items(self):
+        return zip(self._ids[:self._size].tolist(), self._hashes[:self._size].tolist())
+
+    # ----- queries -----
+    def nearest(self, value, k):
+        # k closest (report_id, distance) pairs, closest first
+        n = self._size
+        if n == 0 or k <= 0:
+            return []
+        distances = popcount64(self._hashes[:n] ^ np.uint64(value))
+        if k < n:
+            picked = np.argpartition(distances, k - 1)[:k]
+        else:
+            picked = np.arange(n)
+        ids = self._ids[picked]
+        order = np.lexsort((ids, distances[picked]))
+        return list(zip(ids[order].tolist(), distances[picked][order].tolist()))
+
+    def distances(self, value, report_ids):
+        # {report_id: distance} for the given ids that have a stored hash
+        known = [(rid, self._slots[rid]) for rid in report_ids if rid in self._slots]
+        if not known:
+            return {}
+        slots = np.fromiter((slot for _, slot in known), dtype=np.int64, count=len(known))
+        distances = popcount64(self._hashes[slots] ^ np.uint64(value))
+        return dict(zip((rid for rid, _ in known), distances.tolist()))
+
+    # ----- snapshots -----
+    def save(self, directory, meta=None):
+        # Write hashes.npy / ids.npy / meta.json atomically into directory
+        os.makedirs(directory, exist_ok=True)
+        for name, array in (('hashes', self._hashes), ('ids', self._ids)):
+            tmp = os.path.join(directory, f'{name}.npy.tmp')
+            with open(tmp, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array[:self._size]))
+            os.replace(tmp, os.path.join(directory, f'{name}.npy'))
+        tmp = os.path.join(directory, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(dict(meta or {}, size=self._size), f)
+        os.replace(tmp, os.path.join(directory, 'meta.json'))
+
+    @classmethod
+    def load(cls, directory):
+        # Memory-map a snapshot; returns (store, meta) or (None, None)
+        try:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+            hashes = np.load(os.path.join(directory, 'hashes.npy'), mmap_mode='r')
+            ids = np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            return None, None
+        if len(hashes) != meta.get('size') or len(ids) != len(hashes):
+            return None, None
+        store = cls(capacity=0)
+        store._hashes, store._ids, store._size = hashes, ids, len(hashes)
+        store._slots = dict(zip(ids.tolist(), range(len(ids))))
+        store._writable = False
+        return store, meta
@@ -0,0 +1,103 @@
+"""
+Keyset (cursor) pagination for search results.
+
+Results are ordered over the whole match set, by (BM25 rank, id) for keyword
+searches and by (date_posted, id) newest first otherwise. Each page remembers
+the sort key of its last row in an opaque cursor, and the next page continues
+with a WHERE on that key instead of an OFFSET, so page 50 costs the same as
+page 1. Totals come from a short-lived count cache, not a COUNT(*) per page.
+"""
+import base64
+import json
+import threading
+import time
+
+from sqlalchemy import String, and_, or_, type_coerce
+
+from ..models import Report
+
+
+# ---------- cursors ----------
+def encode_cursor(key):
+    # Sort key of the last row on a page -> URL-safe token
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    # Token -> sort key list, or None if missing / malformed
+    if not token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(key, list) or len(key) != 2 or not isinstance(key[1], int):
+        return None
+    return key
+
+
+def posted_text():
+    # date_posted compared as the stored text, so rows written with and without
+    # microseconds still page correctly (and an index on it stays usable)
+    return type_coerce(Report.date_posted, String)
+
+
+def newest_first(query, key=None):
+    # Order a query / select newest first, continuing after key = [date_posted, id]
+    if key and isinstance(key[0], str):
+        posted = posted_text()
+        query = query.filter(or_(posted < key[0], and_(posted == key[0], Report.id < key[1])))
+    return query.order_by(Report.date_posted.desc(), Report.id.desc())
+
+
+def keyset_page(query, rank, per_page, cursor=None):
+    # One page of (report, rank) rows after `cursor`; returns (rows, next_cursor)
+    key = decode_cursor(cursor)
+    if rank is not None:
+        if key and isinstance(key[0], (int, float)):
+            query = query.filter(or_(rank > key[0], and_(rank == key[0], Report.id > key[1])))
+        query = query.add_columns(rank).order_by(rank, Report.id)
+    else:
+        query = newest_first(query.add_columns(posted_text()), key)
+
+    # One extra row tells whether there is a next page
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        report, sort_value = rows[per_page - 1]
+        next_cursor = encode_cursor([sort_value, report.id])
+    if rank is None:
+        return [(r, None) for r, _ in rows[:per_page]], next_cursor
+    return rows[:per_page], next_cursor
+
+
+# ---------- totals ----------
+class CountCache:
+    # (q, category) -> match count, kept for `ttl` seconds
+
+    def __init__(self, ttl=60, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_count(self, key, query):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        total = query.order_by(None).count()
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                # Drop expired entries first, then the oldest if still full
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.maxsize:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (total, now + self.ttl)
+        return total
+
+
+count_cache = CountCache()
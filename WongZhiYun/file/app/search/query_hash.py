@@ -0,0 +1,62 @@
+"""
+Hashing of uploaded query images.
+
+Query images are hashed straight from the request bytes, so nothing is written
+to static/uploads (where a query named key.jpg used to overwrite a real report
+image). The fingerprints are kept in a bounded LRU keyed by the SHA-256 of the
+bytes, so searching again with the same photo skips the decode entirely.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from ..hashing import compute_fingerprints
+
+
+class QueryHashCache:
+    # Bounded LRU: sha256(image bytes) -> fingerprint dict (treat as read-only)
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return self._entries[digest]
+            self.misses += 1
+
+        # Decode outside the lock so other requests are not blocked
+        fingerprints = compute_fingerprints(io.BytesIO(data))
+        with self._lock:
+            self._entries[digest] = fingerprints
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return fingerprints
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+query_hash_cache = QueryHashCache()
+
+
+def hash_query_image(file_storage):
+    # Fingerprints of an uploaded werkzeug FileStorage, computed in memory
+    return query_hash_cache.get_or_compute(file_storage.read())
@@ -0,0 +1,58 @@
+"""
+Weighted top-k scoring for combined (text + image) search.
+
+Each signal ("text", "image", ...) is one NumPy array of 0..1 scores aligned
+with an array of candidate report ids. The final score is the weighted sum of
+all signals, computed in one vectorised pass, and only the best k candidates
+are kept with a bounded heap instead of sorting every candidate. New signals
+plug in by passing another array and giving it a weight.
+"""
+import heapq
+
+import numpy as np
+
+
+def normalize_weights(weights):
+    # Non-negative weights scaled to sum to 1 (all zero -> equal weights)
+    weights = {name: max(0.0, float(w)) for name, w in weights.items()}
+    total = sum(weights.values())
+    if total == 0:
+        return {name: 1.0 / len(weights) for name in weights} if weights else {}
+    return {name: w / total for name, w in weights.items()}
+
+
+class ScoringEngine:
+    # Combines per-signal score arrays with weights and keeps the top k
+
+    def __init__(self, weights=None, k=50):
+        self.weights = normalize_weights(weights or {'text': 0.4, 'image': 0.6})
+        self.k = k
+
+    def with_weights(self, **weights):
+        # Copy of this engine with some weights overridden (e.g. from a form)
+        return ScoringEngine(dict(self.weights, **weights), self.k)
+
+    def combine(self, signals, size):
+        # Weighted sum of the signal arrays; missing signals count as 0
+        final = np.zeros(size, dtype=np.float64)
+        for name, weight in self.weights.items():
+            scores = signals.get(name)
+            if scores is not None and weight:
+                final += weight * np.asarray(scores, dtype=np.float64)
+        return final
+
+    def top_k(self, ids, signals, k=None):
+        # [(id, final, {signal: score})] for the best k candidates, best first.
+        # Ties keep the order the candidates were given in.
+        k = self.k if k is None else k
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0 or k <= 0:
+            return []
+        signals = {name: np.asarray(s, dtype=np.float64) for name, s in signals.items()}
+        final = self.combine(signals, len(ids))
+        # Heap entries are (score, -position) so earlier candidates win ties
+        best = heapq.nlargest(k, zip(final.tolist(), range(0, -len(ids), -1)))
+        return [
+            (int(ids[-neg_i]), score, {name: float(s[-neg_i]) for name, s in signals.items()})
+            for score, neg_i in best
+        ]
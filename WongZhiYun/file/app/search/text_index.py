@@ -0,0 +1,258 @@
+"""
+In-memory inverted index over approved reports, with typo-tolerant lookup.
+
+Every report's title, description, location and category are tokenised into
+per-token postings (report id -> field-weighted term count). The vocabulary is
+indexed again by character trigrams, so a misspelt query token ("earfone",
+"calculater") is resolved to the indexed tokens it shares enough trigrams with
+and that are within a small edit distance. Like the hash index, the postings
+follow the post change log: only changed reports are re-read, and the log is
+polled at most once every SYNC_INTERVAL seconds, so most queries never touch
+SQLite at all.
+"""
+import bisect
+import math
+import re
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+from .changes import ChangeFeed
+
+# Weight of one occurrence of a token in each field
+FIELD_WEIGHTS = {'title': 3.0, 'description': 1.0, 'location': 1.5, 'category': 1.5}
+
+# How much a fuzzy / prefix hit counts compared to an exact token match
+PREFIX_SIMILARITY = 0.8
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_COLUMNS = "id, title, description, location, category, image, image_hash, date_posted"
+
+
+# ---------- helpers ----------
+def tokenize(value):
+    return _TOKEN_RE.findall((value or '').lower())
+
+
+def trigrams(token):
+    # Padded so the start and end of a word count too: wal -> $wa, wal, al$
+    padded = f'${token}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(token):
+    # Typos allowed for a query token of this length
+    if len(token) <= 3:
+        return 0
+    return 1 if len(token) <= 5 else 2
+
+
+def edit_distance(a, b, limit):
+    # Levenshtein distance, or limit + 1 as soon as it must exceed limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TextIndex:
+    SYNC_INTERVAL = 1.0     # seconds between change log polls
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._feed = ChangeFeed('text_index')
+        self._last_poll = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.docs = {}          # report id -> dict of the fields search_api returns
+        self._postings = {}     # token -> {report id: weighted count}
+        self._doc_tokens = {}   # report id -> tokens it is posted under
+        self._grams = {}        # trigram -> tokens in the vocabulary
+        self._by_date = {}      # category (None = all) -> sorted [(date_posted, id)]
+
+    def __len__(self):
+        return len(self.docs)
+
+    @staticmethod
+    def _date_key(doc):
+        return (doc['date_posted'] or '', doc['id'])
+
+    @property
+    def generation(self):
+        # Change log position the index reflects (None before the first sync)
+        return self._feed.last_seq
+
+    # ----- incremental updates -----
+    def add(self, row):
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row[field]):
+                weights[token] = weights.get(token, 0.0) + weight
+        with self._lock:
+            self.remove(row['id'])
+            self.docs[row['id']] = row
+            self._doc_tokens[row['id']] = list(weights)
+            for token, weight in weights.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    for gram in trigrams(token):
+                        self._grams.setdefault(gram, set()).add(token)
+                postings[row['id']] = weight
+            key = self._date_key(row)
+            for category in (None, row['category']):
+                bisect.insort(self._by_date.setdefault(category, []), key)
+
+    def remove(self, report_id):
+        with self._lock:
+            doc = self.docs.pop(report_id, None)
+            if doc is None:
+                return
+            key = self._date_key(doc)
+            for category in (None, doc['category']):
+                dates = self._by_date[category]
+                del dates[bisect.bisect_left(dates, key)]
+                if not dates:
+                    del self._by_date[category]
+            for token in self._doc_tokens.pop(report_id):
+                postings = self._postings[token]
+                del postings[report_id]
+                if postings:
+                    continue
+                # Last report using this token: drop it from the vocabulary
+                del self._postings[token]
+                for gram in trigrams(token):
+                    tokens = self._grams[gram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._grams[gram]
+
+    # ----- queries -----
+    def expand(self, token):
+        # Indexed tokens matching a query token: {token: similarity 0..1}
+        with self._lock:
+            matches = {token: 1.0} if token in self._postings else {}
+            if len(token) < 2:
+                return matches
+
+            # Prefix: vocabulary tokens containing every trigram of "$token"
+            head = trigrams(token)
+            head.discard(token[-2:] + '$')
+            for candidate in set.intersection(*(self._grams.get(g, set()) for g in head)):
+                if candidate != token and candidate.startswith(token):
+                    matches.setdefault(candidate, PREFIX_SIMILARITY)
+
+            # Typos: candidates must share enough trigrams to be within k edits
+            k = max_edits(token)
+            if k == 0:
+                return matches
+            grams = trigrams(token)
+            shared = {}
+            for gram in grams:
+                for candidate in self._grams.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            needed = max(1, len(grams) - 3 * k)
+            for candidate, count in shared.items():
+                if count < needed or candidate in matches:
+                    continue
+                d = edit_distance(token, candidate, k)
+                if d <= k:
+                    matches[candidate] = 1.0 - d / (len(token) + 1)
+            return matches
+
+    def search(self, q, category=None, limit=None, after=None):
+        # [(doc, score)] best first; every query token must match (possibly fuzzily).
+        # `after` = (score, id) of the last hit already returned
+        tokens = list(dict.fromkeys(tokenize(q)))
+        if not tokens:
+            return []
+        with self._lock:
+            n = len(self.docs) or 1
+            scores = None
+            for token in tokens:
+                token_scores = {}
+                for match, similarity in self.expand(token).items():
+                    postings = self._postings[match]
+                    idf = math.log(1.0 + n / len(postings))
+                    for report_id, weight in postings.items():
+                        s = similarity * idf * weight
+                        if s > token_scores.get(report_id, 0.0):
+                            token_scores[report_id] = s
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {rid: s + token_scores[rid] for rid, s in scores.items() if rid in token_scores}
+                if not scores:
+                    return []
+
+            hits = [(self.docs[rid], s) for rid, s in scores.items()
+                    if (not category or self.docs[rid]['category'] == category)
+                    and (after is None or s < after[0] or (s == after[0] and rid > after[1]))]
+        hits.sort(key=lambda hit: (-hit[1], hit[0]['id']))
+        return hits[:limit] if limit else hits
+
+    def latest(self, category=None, limit=None, before=None):
+        # Reports newest first, for requests without a query.
+        # `before` = (date_posted, id) of the last report already returned.
+        # A bisect into the per-category date order, so a page costs O(log n + limit)
+        with self._lock:
+            dates = self._by_date.get(category or None, [])
+            end = bisect.bisect_left(dates, tuple(before)) if before else len(dates)
+            start = max(0, end - limit) if limit else 0
+            return [self.docs[report_id] for _, report_id in reversed(dates[start:end])]
+
+    # ----- database sync -----
+    def sync(self, session, force=False):
+        # Full load on first use, then replay changed posts at most every SYNC_INTERVAL
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._feed.started and now - self._last_poll < self.SYNC_INTERVAL:
+                return
+            self._last_poll = now
+            if not self._feed.started:
+                self._load_all(session)
+                return
+            changed = self._feed.pending(session)
+            if changed is None:
+                self._load_all(session)
+            elif changed:
+                self._apply(session, changed)
+
+    def _load_all(self, session):
+        self._feed.start(session)
+        self._reset()
+        # Oldest first, so every insert into the date order is an append
+        rows = session.execute(text(f"SELECT {_COLUMNS} FROM post WHERE is_approved = 1 ORDER BY date_posted, id"))
+        for row in rows.mappings():
+            self.add(dict(row))
+
+    def _apply(self, session, changed):
+        rows = session.execute(
+            text(f"SELECT {_COLUMNS}, is_approved FROM post WHERE id IN :ids")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(changed)},
+        ).mappings().fetchall()
+        seen = set()
+        for row in rows:
+            row = dict(row)
+            seen.add(row['id'])
+            if row.pop('is_approved'):
+                self.add(row)
+            else:
+                self.remove(row['id'])
+        for report_id in changed - seen:
+            self.remove(report_id)
+
+
+# Shared index for search_api
+text_index = TextIndex()
@@ -0,0 +1,142 @@
+"""
+Thumbnails of uploaded images, shared by the main site, the search service
+and the chat app.
+
+Thumbnails are made lazily the first time a size is asked for, at one of a
+few fixed widths, as WebP (when the browser accepts it) or JPEG. They are
+cached on disk under the SHA-256 of the source bytes, so the same photo
+uploaded twice is resized once and a replaced upload never serves a stale
+thumbnail. Nothing here depends on Flask except init_app.
+"""
+import hashlib
+import os
+import threading
+
+from PIL import Image, ImageOps, features
+
+# Fixed bounding boxes (px); requests are rounded up to the next one
+THUMB_SIZES = (128, 320, 640)
+QUALITY = {'webp': 80, 'jpeg': 82}
+WEBP_SUPPORTED = features.check('webp')
+
+
+def thumbnail_size(requested):
+    # Smallest fixed size that covers the requested one
+    for size in THUMB_SIZES:
+        if requested <= size:
+            return size
+    return THUMB_SIZES[-1]
+
+
+def render_thumbnail(source_path, dest_path, size, fmt):
+    # Write a `size` x `size` bounded thumbnail of source_path to dest_path
+    with Image.open(source_path) as img:
+        img.draft('RGB', (size, size))      # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size), Image.LANCZOS)
+        if fmt == 'jpeg':
+            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+                # JPEG has no alpha: flatten onto white
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+        elif img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+        tmp = f'{dest_path}.{threading.get_ident()}.tmp'
+        img.save(tmp, 'WEBP' if fmt == 'webp' else 'JPEG', quality=QUALITY[fmt], optimize=fmt == 'jpeg')
+    os.replace(tmp, dest_path)
+
+
+class ThumbnailStore:
+    # Lazily created, digest-keyed thumbnails of the files in source_dir
+
+    def __init__(self, source_dir=None, cache_dir=None):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self._digests = {}      # path -> (size, mtime_ns, sha256)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.served = 0
+
+    def configure(self, source_dir, cache_dir):
+        self.source_dir = os.path.abspath(source_dir)
+        self.cache_dir = os.path.abspath(cache_dir)
+
+    def source_path(self, filename):
+        # Absolute path of an upload, or None if it escapes source_dir
+        path = os.path.abspath(os.path.join(self.source_dir, filename))
+        if not path.startswith(self.source_dir + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def digest(self, path):
+        # SHA-256 of a file, remembered until its size or mtime changes
+        st = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+        if known and known[:2] == (st.st_size, st.st_mtime_ns):
+            return known[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[path] = (st.st_size, st.st_mtime_ns, digest)
+        return digest
+
+    def get(self, filename, size, fmt='jpeg'):
+        # Path of the thumbnail (created on first use) and the source digest;
+        # (None, None) if the upload does not exist. Raises if it cannot be decoded.
+        source = self.source_path(filename)
+        if source is None:
+            return None, None
+        size = thumbnail_size(size)
+        fmt = fmt if fmt == 'jpeg' or WEBP_SUPPORTED else 'jpeg'
+        digest = self.digest(source)
+        ext = 'webp' if fmt == 'webp' else 'jpg'
+        dest = os.path.join(self.cache_dir, digest[:2], f'{digest}_{size}.{ext}')
+        if not os.path.exists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            render_thumbnail(source, dest, size, fmt)
+            with self._lock:
+                self.created += 1
+        with self._lock:
+            self.served += 1
+        return dest, digest
+
+
+# ---------- Flask ----------
+def init_app(app, source_dir, cache_dir, store=None):
+    # Serve /thumbs/<size>/<filename> and add a thumb_url(filename, size) template global
+    from flask import abort, request, send_file, url_for
+
+    store = store or thumbnail_store
+    store.configure(source_dir, cache_dir)
+
+    def thumbnail(size, filename):
+        fmt = 'webp' if WEBP_SUPPORTED and request.accept_mimetypes['image/webp'] else 'jpeg'
+        try:
+            path, digest = store.get(filename, size, fmt)
+        except Exception as e:
+            app.logger.warning(f"Thumbnail of {filename} failed: {e}")
+            path = digest = None
+        if path is None:
+            abort(404)
+        response = send_file(path, mimetype=f'image/{fmt}', etag=f'{digest}-{thumbnail_size(size)}-{fmt}',
+                             max_age=7 * 24 * 3600, conditional=True)
+        response.vary.add('Accept')
+        return response
+
+    def thumb_url(filename, size=320):
+        return url_for('thumbnail', size=thumbnail_size(size), filename=filename)
+
+    app.add_url_rule('/thumbs/<int:size>/<path:filename>', 'thumbnail', thumbnail)
+    app.add_template_global(thumb_url, 'thumb_url')
+
+
+# Store used by whichever app imports this module
+thumbnail_store = ThumbnailStore()
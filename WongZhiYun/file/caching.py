@@ -0,0 +1,214 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import make_response, request, session
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import func, text
+
+from .models import Post, db
+
+
+# Small in-process caches for the main site.
+# Values are kept for at most `ttl` seconds and dropped as soon as a view
+# changes the data they were built from (approve, delete, new report), so
+# the TTL only bounds how long changes made outside this process can go unseen.
+class TTLCache:
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = {}      # key -> (value, expires)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_set(self, key, build):
+        # Cached value of key, calling build() to make it on a miss
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+        return value
+
+    def invalidate(self, key=None):
+        # Drop one entry, or everything
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+stats_cache = TTLCache(ttl=60)
+
+
+def build_dashboard_stats():
+    # Every dashboard counter from one GROUP BY over (is_approved, type),
+    # answered from the ix_post_approved_type_date index.
+    rows = (db.session.query(Post.is_approved, Post.type, func.count(Post.id))
+            .group_by(Post.is_approved, Post.type)
+            .all())
+    stats = {'pending_count': 0, 'approved_count': 0, 'type_data': {}}
+    for approved, post_type, count in rows:
+        stats['approved_count' if approved else 'pending_count'] += count
+        stats['type_data'][post_type] = stats['type_data'].get(post_type, 0) + count
+    return stats
+
+
+def dashboard_stats():
+    return stats_cache.get_or_set('dashboard', build_dashboard_stats)
+
+
+def invalidate_dashboard_stats():
+    stats_cache.invalidate('dashboard')
+
+
+# Rendered post cards.
+# A card is rendered once per (template, post id, version) and then reused as
+# a plain string. The version is made of the post fields that can change after
+# the post is created, so a card changed by another process (hash worker,
+# username edit) simply misses; approve/close/delete also drop the post's
+# cards right away so old versions don't sit in the LRU.
+class FragmentCache:
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()   # (template, post_id, version) -> Markup
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        html = Markup(render())
+        with self._lock:
+            self._entries[key] = html
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return html
+
+    def invalidate(self, post_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == post_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+card_cache = FragmentCache()
+
+
+def card_version(post):
+    author = post.author
+    return (post.is_approved, post.is_closed, post.duplicate_of, author.username if author else None)
+
+
+def init_app(app):
+    # {{ cached_card('cards/feed_card.html', post) }} renders a card with only `post` in scope
+    def cached_card(template, post):
+        key = (template, post.id, card_version(post))
+        return card_cache.get_or_render(key, lambda: app.jinja_env.get_template(template).render(post=post))
+
+    app.add_template_global(cached_card, 'cached_card')
+
+
+# Conditional GET for the public pages.
+# The validators only need a few primary key lookups: the end of the post
+# change log (every insert/update/delete of a post, see app/search/changes.py),
+# the newest comment id, a counter that a trigger bumps on every user update
+# (profile edits, from this site or the chat app) and an epoch bumped each time
+# the app starts, so pages rendered by older code never match. All of them live
+# in the database, so every worker process computes the same version. Any change
+# anywhere gives every page a new ETag; that is coarse, but checking it costs
+# far less than the page queries and an unchanged refresh becomes a 304.
+# Last-Modified is the time this process first saw the current version, which
+# is never earlier than the change itself.
+SITE_COUNTER_DDL = [
+    "CREATE TABLE IF NOT EXISTS site_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO site_counters (name, value) VALUES ('user_edits', 0)",
+    "INSERT OR IGNORE INTO site_counters (name, value) VALUES ('epoch', 0)",
+    "UPDATE site_counters SET value = value + 1 WHERE name = 'epoch'",
+    """
+    CREATE TRIGGER IF NOT EXISTS site_counters_user_au AFTER UPDATE ON "user" BEGIN
+        UPDATE site_counters SET value = value + 1 WHERE name = 'user_edits';
+    END
+    """,
+]
+
+
+def install_site_counters(engine):
+    # Create the counter table and its trigger, and start a new epoch
+    # (run once per process start)
+    with engine.begin() as conn:
+        for ddl in SITE_COUNTER_DDL:
+            conn.execute(text(ddl))
+
+
+class SiteVersion:
+    def __init__(self):
+        self._seen = (None, None)           # (version, first seen at)
+        self._lock = threading.Lock()
+
+    def current(self):
+        # (version tuple, last modified)
+        seq, last_comment, user_edits, epoch = db.session.execute(text(
+            "SELECT (SELECT COALESCE(MAX(seq), 0) FROM post_changes), (SELECT COALESCE(MAX(id), 0) FROM comment),"
+            " (SELECT value FROM site_counters WHERE name = 'user_edits'),"
+            " (SELECT value FROM site_counters WHERE name = 'epoch')"
+        )).one()
+        with self._lock:
+            version = (epoch, seq, last_comment, user_edits)
+            if self._seen[0] != version:
+                self._seen = (version, datetime.now(timezone.utc).replace(microsecond=0))
+            return self._seen
+
+
+site_version = SiteVersion()
+
+
+def conditional_page(view):
+    # Answer If-None-Match / If-Modified-Since with 304 before the view runs.
+    # Pages are per user, so the user id is part of the ETag.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)    # a pending flash message must be rendered
+
+        version, modified = site_version.current()
+        viewer = current_user.get_id() if current_user.is_authenticated else 'anon'
+        etag = hashlib.sha1(f"{version}|{viewer}|{request.full_path}".encode()).hexdigest()[:20]
+
+        if request.if_none_match:
+            fresh = request.if_none_match.contains(etag)
+        else:
+            fresh = request.if_modified_since is not None and modified <= request.if_modified_since
+        response = make_response('', 304) if fresh else make_response(view(*args, **kwargs))
+        if response.status_code in (200, 304):
+            response.set_etag(etag)
+            response.last_modified = modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+        return response
+
+    return wrapper
@@ -17,6 +17,7 @@ from .pages.auth import show_login_page
 from file.chat_v2.core.startup_checker import run_startup_checks
 from file.chat_v2.core.middleware import AuthMiddleware
 from .services.database import db_service
+from .core.thumbnails import setup_thumbnail_route
 
 #Setup application routes
 def setup_routes():
@@ -47,6 +48,7 @@ def main():
 
     # Setup static files
     app.add_static_files('/static', STATIC_REAL_PATH)
+    setup_thumbnail_route(app)
     
     # Start application
     ui.run(
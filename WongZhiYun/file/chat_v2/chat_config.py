@@ -99,6 +99,14 @@ class Config:
     STATIC_DIR = 'static'
     STATIC_URL = '/static'
 
+    # Messages loaded per page when opening a chat or scrolling back
+    CHAT_PAGE_SIZE = int(os.getenv('CHAT_PAGE_SIZE', 50))
+    # Conversations listed per page in the sidebar
+    SIDEBAR_PAGE_SIZE = int(os.getenv('SIDEBAR_PAGE_SIZE', 30))
+
+    # Resized chat images (see core/thumbnails.py)
+    THUMB_CACHE_DIR = os.getenv('THUMB_CACHE_DIR', os.path.join(BASE_DIR, 'instance', 'thumbs'))
+
     # ===============================================
     # Log configuration
     # ===============================================
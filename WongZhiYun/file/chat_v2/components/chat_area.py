@@ -5,6 +5,7 @@ It holds UI state (like pending image uploads) but does not perform business log
 """
 from nicegui import ui
 from ..core.utils import safe_str
+from ..core.thumbnails import thumb_url
 import uuid
 from pathlib import Path
 import base64
@@ -89,13 +90,13 @@ def create_input_area(on_send: Callable) -> ui.input:
         
         return message_input
 
-def create_message_bubble(msg, current_user_id: int, open_viewer_func: Callable) -> None:
-    """Creates a single message bubble with text and/or an image grid."""
+def create_message_bubble(msg, current_user_id: int, open_viewer_func: Callable) -> ui.element:
+    """Creates a single message bubble with text and/or an image grid and returns it."""
     is_sent = msg.sender_id == current_user_id    # Check if the message is sent by the current user
     time_str = msg.created_at.strftime('%H:%M')   # Format timestamp as HH:MM (e.g., 14:25)
     message_class = 'custom-message sent' if is_sent else 'custom-message received'
     
-    with ui.element('div').classes(message_class):
+    with ui.element('div').classes(message_class) as bubble:
         with ui.element('div').classes('p-1'):
 
             if msg.content:   # If the message has text content, render it
@@ -109,6 +110,7 @@ def create_message_bubble(msg, current_user_id: int, open_viewer_func: Callable)
             # Timestamp below the message bubble
             with ui.element('div').classes('px-2'):
                 ui.label(time_str).classes('text-right mt-1 text-gray-500 text-xs')
+    return bubble
 
 # --- UI Helper Functions (Internal to this component) ---
 
@@ -129,8 +131,8 @@ def _create_image_grid(media_items: List, open_viewer_func: Callable) -> None:
         if total_images == 1:
             item = images_to_display[0]
             with ui.element('div').classes('relative cursor-pointer'):
-                # Display full-size image
-                ui.image(f"/static/uploads/{item.file_url}").classes('w-full h-full object-cover aspect-[4/3]')
+                # Display a resized copy (w-64 = 256px, 640 covers high-DPI screens)
+                ui.image(thumb_url(item.file_url, 640)).classes('w-full h-full object-cover aspect-[4/3]')
                 # Transparent clickable overlay that opens viewer
                 ui.element('div').classes('absolute inset-0').on('click', lambda: open_viewer_func(media_items, 0))
         else:
@@ -139,7 +141,7 @@ def _create_image_grid(media_items: List, open_viewer_func: Callable) -> None:
                 with ui.element('div').classes('relative aspect-square cursor-pointer'):
 
                     # Display thumbnail
-                    ui.image(f"/static/uploads/{item.file_url}").classes('w-full h-full object-cover')
+                    ui.image(thumb_url(item.file_url, 320)).classes('w-full h-full object-cover')
                     # If there are more than 4 images, show "+N" overlay on last
                     if i == 3 and total_images > 4:
                         with ui.element('div').classes('absolute inset-0 bg-black/60 flex items-center justify-center'):
@@ -2,14 +2,17 @@
 Sidebar component
 """
 from nicegui import ui
-from sqlalchemy import or_
+from file.chat_v2.chat_config import config
 from ..core.utils import format_timestamp, truncate_message
-from file.models import Message, User
+from ..services.broker import broker
+from ..services.conversations import list_conversations
+from ..services.database import SessionLocal
+from file.models import User
 from ..components.dialogs import open_new_chat_dialog
 from ..handlers.auth import handle_logout
 
 
-"""Create sidebar component"""
+"""Create sidebar component, returns its ConversationList"""
 def create_sidebar(db, current_user_id: int):
     with ui.element('div').classes('custom-sidebar'):
         # Sidebar header
@@ -20,23 +23,139 @@ def create_sidebar(db, current_user_id: int):
         
         # Conversations list
         conversations_container = ui.element('div').classes('custom-conversations flex-1 overflow-y-auto')
-        
-        # Load conversations list function
-        def load_conversations_with_search():
-            search_term = search_input.value.strip() if search_input.value else ""
-            load_conversations(db, current_user_id, conversations_container, search_term)
+        conversations = ConversationList(conversations_container, current_user_id)
         
         # Initial load
-        load_conversations_with_search()
-        
-        # Bind search functionality with debounce
-        def search_conversations():
-            """Search conversations with a small delay to avoid too many requests"""
-            load_conversations_with_search()
+        conversations.reload()
         
-        search_input.on_value_change(lambda: ui.timer(0.3, search_conversations, once=True))
+        # Debounced search: each keystroke replaces the pending search
+        search_input.on_value_change(lambda e: conversations.schedule(0.3, search_term=e.value or ""))
+
+        # Re-sort and update badges when a message is sent or received
+        broker.subscribe_client(ui.context.client, current_user_id,
+                                lambda msg, origin: conversations.schedule(0.1))
         
-        return conversations_container
+        return conversations
+
+
+class ConversationList:
+    """
+    Sidebar conversation items, keyed by partner id
+
+    A reload queries the conversations again and diffs them against the items
+    on screen: unchanged items stay (moved if their position changed), changed
+    ones are rebuilt and missing ones deleted, so only the differences are sent
+    to the browser.
+    """
+
+    def __init__(self, container, current_user_id: int):
+        self.container = container
+        self.current_user_id = current_user_id
+        self.search_term = ""
+        self.items = {}         # partner_id -> (element, item key)
+        self.shown = 0          # conversations listed, grows with "More conversations"
+        self._timer = None
+        self._last = None       # (last_message_at, id) of the last conversation listed
+        self._empty = None
+        self._more = None
+
+    def schedule(self, delay: float, search_term: str = None) -> None:
+        """Reload after `delay` seconds, cancelling a reload that is still pending"""
+        if self._timer is not None:
+            self._timer.cancel()
+        if search_term is not None:
+            search_term = search_term.strip()
+            if search_term != self.search_term:
+                self.search_term = search_term
+                self.shown = 0
+        # Next to the list rather than in it, so item positions stay 0..n-1
+        with self.container.parent_slot:
+            self._timer = ui.timer(delay, self.reload, once=True)
+
+    def reload(self) -> None:
+        """Show the first page (or as many conversations as are listed now)"""
+        self._timer = None
+        limit = max(self.shown, config.SIDEBAR_PAGE_SIZE)
+        db = SessionLocal()
+        try:
+            rows, has_more = list_conversations(db, self.current_user_id, self.search_term, limit=limit)
+        finally:
+            db.close()
+        self._render(rows, has_more)
+
+    def load_more(self) -> None:
+        """Append the next page after the last conversation listed"""
+        last = self._last
+        db = SessionLocal()
+        try:
+            rows, has_more = list_conversations(db, self.current_user_id, self.search_term, before=last,
+                                                limit=config.SIDEBAR_PAGE_SIZE)
+        finally:
+            db.close()
+        for summary, partner in rows:
+            self._place(len(self.items), partner.id, _conversation_data(summary, partner))
+        self._remember_last(rows)
+        self.shown = len(self.items)
+        self._update_more(has_more)
+
+    def _render(self, rows, has_more: bool) -> None:
+        wanted = [(partner.id, _conversation_data(summary, partner)) for summary, partner in rows]
+        wanted_ids = {partner_id for partner_id, _ in wanted}
+        for partner_id in [p for p in self.items if p not in wanted_ids]:
+            self.items.pop(partner_id)[0].delete()
+
+        # Empty state (its text depends on the search term, so always rebuilt)
+        if self._empty is not None:
+            self._empty.delete()
+            self._empty = None
+        if not wanted:
+            if self.search_term:
+                self._empty = _show_conversations_search_empty_state(self.container, self.search_term)
+            else:
+                self._empty = _show_conversations_empty_state(self.container)
+
+        for index, (partner_id, data) in enumerate(wanted):
+            self._place(index, partner_id, data)
+        self._remember_last(rows)
+        self.shown = len(self.items)
+        self._update_more(has_more)
+
+    def _place(self, index: int, partner_id: int, data: dict) -> None:
+        # Keep, move or rebuild the item of one partner so it ends up at `index`
+        key = _item_key(data)
+        current = self.items.get(partner_id)
+        if current is not None and current[1] == key:
+            element = current[0]
+            if self.container.default_slot.children.index(element) != index:
+                element.move(target_index=index)
+        else:
+            if current is not None:
+                current[0].delete()
+            with self.container:
+                element = _create_conversation_item(partner_id, data)
+            element.move(target_index=index)
+        self.items[partner_id] = (element, key)
+
+    def _remember_last(self, rows) -> None:
+        if rows:
+            summary = rows[-1][0]
+            self._last = (summary.last_message_at, summary.id)
+
+    def _update_more(self, has_more: bool) -> None:
+        # "More conversations" item, always last
+        if not has_more:
+            if self._more is not None:
+                self._more.delete()
+                self._more = None
+            return
+        if self._more is None:
+            with self.container:
+                self._more = ui.element('div').classes('custom-conversation-more')
+                with self._more:
+                    ui.label('More conversations')
+            self._more.on('click', self.load_more)
+        else:
+            self._more.move(target_index=-1)
 
 
 """Create sidebar header"""
@@ -68,68 +187,42 @@ def _create_search_bar(): # Input for searching by username
     search_input = ui.input(placeholder='Search or start new chat').props(' clearable').classes('w-full bg-gray-100 px-4 py-2 ')
     return search_input
 
-"""Load conversations list"""
-def load_conversations(db, current_user_id: int, container, search_term: str = ""):
-    container.clear()
-    
-    # Get all related messages
-    messages = db.query(Message).filter(
-        or_(getattr(Message, 'sender_id') == current_user_id, getattr(Message, 'receiver_id') == current_user_id)
-    ).order_by(getattr(Message, 'created_at').desc()).all()
-
-    # Get the last message for each conversation partner
-    partners_with_last_message = {}
-    for msg in messages:
-        # Identify partner (the other user in the conversation)
-        partner_id = msg.receiver_id if msg.sender_id == current_user_id else msg.sender_id
-        
-        # If we don't already have this partner, save their latest message
-        if partner_id not in partners_with_last_message:
-            partner_user = db.query(User).get(partner_id)
-            if partner_user:
-                # Apply search filter
-                if search_term:
-                    if search_term.lower() not in partner_user.username.lower():
-                        continue
-                
-                partners_with_last_message[partner_id] = {
-                    'user': partner_user,
-                    'last_message': str(msg.content) if msg.content else "Image",
-                    'created_at': msg.created_at
-                }
-
-    # If there are no conversations, show empty state
-    if not partners_with_last_message:
-        if search_term:
-            _show_conversations_search_empty_state(container, search_term)
-        else:
-            _show_conversations_empty_state(container)
-        return
+"""Item data of one conversation summary"""
+def _conversation_data(summary, partner) -> dict:
+    return {
+        'user': partner,
+        'last_message': summary.last_message or "Image",
+        'created_at': summary.last_message_at,
+        'unread_count': summary.unread_count,
+    }
 
-    # Show conversations list
-    with container:
-        for partner_id, data in partners_with_last_message.items():
-            _create_conversation_item(partner_id, data)
+
+"""Fields of an item that are shown; the item is rebuilt when they change"""
+def _item_key(data: dict) -> tuple:
+    partner = data['user']
+    return (partner.username, partner.profile_image, data['last_message'], data['created_at'], data['unread_count'])
 
 
 """Show conversations list empty state"""
 def _show_conversations_empty_state(container):
     # Shown when user has no chats at all
     with container:
-        with ui.column().classes('flex-grow items-center justify-center p-8'):
+        with ui.column().classes('flex-grow items-center justify-center p-8') as empty_state:
             ui.icon('chat', size='3rem').classes('text-gray-400 mb-4')
             ui.label('No conversations yet').classes('text-gray-500 text-center')
             ui.label('Start a new chat to see your conversations here').classes('text-gray-400 text-sm text-center')
+    return empty_state
 
 
 """Show search empty state"""
 def _show_conversations_search_empty_state(container, search_term: str):
     with container:
         # Shown when search yields no results
-        with ui.column().classes('flex-grow items-center justify-center p-8'):
+        with ui.column().classes('flex-grow items-center justify-center p-8') as empty_state:
             ui.icon('search_off', size='3rem').classes('text-gray-400 mb-4')
             ui.label(f'No results for "{search_term}"').classes('text-gray-500 text-center')
             ui.label('Try searching for a different name').classes('text-gray-400 text-sm text-center')
+    return empty_state
 
 
 """Create single conversation item"""
@@ -137,6 +230,7 @@ def _create_conversation_item(partner_id: int, data: dict):
     partner = data['user']
     last_message = data['last_message']
     timestamp = data['created_at']
+    unread_count = data.get('unread_count', 0)
     
     # Format time
     time_str = format_timestamp(timestamp)
@@ -146,7 +240,7 @@ def _create_conversation_item(partner_id: int, data: dict):
         return lambda: ui.navigate.to(f'/?chat_with={p_id}')
     
     # Conversation item container
-    with ui.element('div').classes('custom-conversation-item').on('click', create_click_handler(partner_id)):
+    with ui.element('div').classes('custom-conversation-item').on('click', create_click_handler(partner_id)) as item:
         profile_img_url = partner.profile_image or "default.png"
         ui.image(f"/static/profile_pics/{profile_img_url}").classes('w-12 h-12 rounded-full flex-shrink-0 bg-gray-300')
 
@@ -155,5 +249,9 @@ def _create_conversation_item(partner_id: int, data: dict):
             ui.label(partner.username).classes('custom-conversation-name text-sm font-normal text-gray-900 mb-0.5 truncate')
             display_message = truncate_message(last_message)
             ui.label(display_message).classes('custom-conversation-last-message text-sm font-normal text-gray-500 truncate')
-        # Timestamp of last message
-        ui.label(time_str).classes('custom-conversation-time text-sm text-gray-500 whitespace-nowrap')
+        # Timestamp of last message, and unread badge
+        with ui.element('div').classes('flex flex-col items-end gap-1'):
+            ui.label(time_str).classes('custom-conversation-time text-sm text-gray-500 whitespace-nowrap')
+            if unread_count:
+                ui.label(str(unread_count) if unread_count < 100 else '99+').classes('custom-conversation-unread')
+    return item
@@ -17,7 +17,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
         db = SessionLocal()
         
         # Define unprotected paths
-        unprotected_path_prefixes = {'/login', '/_nicegui', '/static', '/static/uploads'}
+        unprotected_path_prefixes = {'/login', '/_nicegui', '/static', '/static/uploads', '/thumbs'}
 
         # Check if the current request path starts with any of the "unprotected" prefixes
         is_unprotected = any(request.url.path.startswith(prefix) for prefix in unprotected_path_prefixes)
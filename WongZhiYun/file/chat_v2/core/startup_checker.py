@@ -3,7 +3,8 @@ Startup System Checker - Verify database, email, and other configurations
 """
 import sys
 from file.chat_v2.chat_config import config
-from ..services.database import db_service
+from ..services.conversations import backfill_summaries
+from ..services.database import SessionLocal, db_service
 from ..services.email import email_service
 
 
@@ -27,6 +28,9 @@ class StartupChecker:
         # Database check
         self._check_database()
         
+        # Sidebar summaries check
+        self._check_conversation_summaries()
+        
         # Email service check
         self._check_email_service()
         
@@ -79,6 +83,20 @@ class StartupChecker:
         except Exception as e:
             self._add_error(f"Database configuration error: {e}")
     
+    def _check_conversation_summaries(self):
+        """Make sure every conversation has a sidebar summary"""
+        print("\nChecking conversation summaries...")
+        
+        db = SessionLocal()
+        try: # Conversations from before the summaries table would be missing from the sidebar
+            added = backfill_summaries(db)
+            self._add_check(f"Conversation summaries up to date ({added} added)")
+        except Exception as e:
+            db.rollback()
+            self._add_error(f"Conversation summaries missing (run 'flask db upgrade'): {e}")
+        finally:
+            db.close()
+    
     def _check_email_service(self):
         """Check email service"""
         print("\nChecking email service...")
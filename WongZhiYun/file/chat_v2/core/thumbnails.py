@@ -0,0 +1,52 @@
+"""
+Thumbnail URLs and route for chat images
+"""
+import asyncio
+import logging
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from file.app.thumbnails import WEBP_SUPPORTED, thumbnail_size, thumbnail_store
+from file.chat_v2.chat_config import STATIC_REAL_PATH, config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(getattr(logging, config.LOG_LEVEL.upper()))
+
+
+def thumb_url(file_url: str, size: int = 320) -> str:
+    """
+    URL of a resized copy of an uploaded image
+
+    Args:
+        file_url: File name inside static/uploads
+        size: Wanted bounding box in px (rounded up to a fixed size)
+
+    Returns:
+        str: /thumbs/<size>/<file_url>
+    """
+    return f"/thumbs/{thumbnail_size(size)}/{file_url}"
+
+
+def setup_thumbnail_route(app) -> None:
+    """Serve /thumbs/<size>/<file> from the shared thumbnail cache"""
+    thumbnail_store.configure(f"{STATIC_REAL_PATH}/uploads", config.THUMB_CACHE_DIR)
+
+    @app.get('/thumbs/{size}/{filename:path}')
+    async def thumbnail(size: int, filename: str, request: Request):
+        fmt = 'webp' if WEBP_SUPPORTED and 'image/webp' in request.headers.get('accept', '') else 'jpeg'
+        try:
+            # Resizing is CPU work, keep it off the event loop
+            path, digest = await asyncio.to_thread(thumbnail_store.get, filename, size, fmt)
+        except Exception as e:
+            logger.warning(f"Thumbnail of {filename} failed: {e}")
+            path = None
+        if path is None:
+            raise HTTPException(status_code=404)
+        etag = f'"{digest}-{thumbnail_size(size)}-{fmt}"'
+        headers = {'Cache-Control': 'public, max-age=604800', 'ETag': etag, 'Vary': 'Accept'}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, media_type=f'image/{fmt}', headers=headers)
+
@@ -3,8 +3,11 @@ Chat handlers - Business Logic Layer
 Handles message sending, database interactions, and triggers email notifications.
 """
 from nicegui import app, ui
-from sqlalchemy import or_
+from sqlalchemy import and_, or_, select, union_all
+from sqlalchemy.orm import selectinload
 from file.models import Media, Message, User
+from ..services.broker import broker
+from ..services.conversations import mark_read, record_message
 from ..services.database import SessionLocal
 from ..services.email import email_service  # ✅ Import global email service
 from ..components.chat_area import (
@@ -13,12 +16,17 @@ from ..components.chat_area import (
     create_message_bubble
 )
 from pathlib import Path
-from typing import List, Dict
-from file.chat_v2.chat_config import STATIC_REAL_PATH
+from typing import Callable, Dict, List, Optional
+from file.chat_v2.chat_config import STATIC_REAL_PATH, config
 
 
-def create_chat_interface(partner_id: int, container: ui.element) -> None:
-    """Builds the complete chat interface for a given partner."""
+def create_chat_interface(partner_id: int, container: ui.element,
+                          on_read: Optional[Callable[[], None]] = None) -> None:
+    """Builds the complete chat interface for a given partner.
+
+    on_read is called when opening the chat marked unread messages as read
+    (the sidebar refreshes its badge).
+    """
     db = SessionLocal()
     try:
         current_user_id = app.storage.user['user_id']
@@ -64,6 +72,11 @@ def create_chat_interface(partner_id: int, container: ui.element) -> None:
 
             # Load messages
             _reload_and_display_messages(db, current_user_id, partner_id, messages_container, open_image_viewer)
+            if mark_read(db, current_user_id, partner_id) and on_read:
+                on_read()
+
+            # Live updates: messages from the partner (or from this user's other tabs)
+            _subscribe_to_conversation(current_user_id, partner_id, messages_container, open_image_viewer)
             
             # Input area
             create_input_area(
@@ -80,7 +93,8 @@ def send_message(input_field, images_to_upload: List[Dict], messages_container,
     """Handles sending a message: save to DB, update UI, and send email notification."""
     text = input_field.value.strip()
     saved_filenames = []
-    db = SessionLocal()
+    # Keep new_msg readable after commit, so its bubble is built without a re-query
+    db = SessionLocal(expire_on_commit=False)
 
     try:
         # Save uploaded files
@@ -96,6 +110,8 @@ def send_message(input_field, images_to_upload: List[Dict], messages_container,
             new_msg.media_items.append(media)
 
         db.add(new_msg)
+        # Sidebar summaries of both users, saved with the message
+        record_message(db, new_msg)
         db.commit()
 
         print(f"Message saved to DB - ID: {new_msg.id}")
@@ -103,8 +119,13 @@ def send_message(input_field, images_to_upload: List[Dict], messages_container,
         # Clear input field after sending
         input_field.set_value('')
 
-        # Update UI
-        _reload_and_display_messages(db, current_user_id, partner_id, messages_container, open_viewer_func)
+        # Update UI: only the new bubble is sent to the browser
+        _append_message(new_msg, current_user_id, messages_container, open_viewer_func)
+
+        # Push to the partner's open chats and this user's other tabs
+        origin = ui.context.client.id
+        broker.publish(partner_id, new_msg, origin)
+        broker.publish(current_user_id, new_msg, origin)
 
         # Send email notification
         partner = db.query(User).get(partner_id)
@@ -128,17 +149,133 @@ def send_message(input_field, images_to_upload: List[Dict], messages_container,
 
 # --- Helpers ---
 def _reload_and_display_messages(db, current_user_id, partner_id, container, open_viewer_func):
+    """Show the newest page of the conversation; older pages load on scroll"""
     container.clear()
-    messages = db.query(Message).filter(
-        or_(
-            (Message.sender_id == current_user_id) & (Message.receiver_id == partner_id),
-            (Message.sender_id == partner_id) & (Message.receiver_id == current_user_id)
-        )
-    ).order_by(Message.created_at.desc()).all()
-    
+    messages, has_more = _load_message_page(db, current_user_id, partner_id)
+
     with container:
         for msg in messages:
             create_message_bubble(msg, current_user_id, open_viewer_func)
+    if has_more:
+        _add_load_older(container, current_user_id, partner_id, messages[-1], open_viewer_func)
+
+
+def _load_message_page(db, current_user_id, partner_id, before=None, limit=None):
+    """
+    One page of a conversation, newest first
+
+    Each direction is read with a keyset range on ix_messages_pair_created
+    (sender, receiver, created_at) and cut to `limit` rows before the two are
+    merged, so a page costs the same however long the conversation is.
+
+    Args:
+        before: (created_at, id) of the oldest message already shown
+        limit: Page size (default config.CHAT_PAGE_SIZE)
+
+    Returns:
+        tuple: (messages with media loaded, whether older messages exist)
+    """
+    limit = limit or config.CHAT_PAGE_SIZE
+
+    def direction(sender_id, receiver_id):
+        q = select(Message.id, Message.created_at).where(
+            Message.sender_id == sender_id, Message.receiver_id == receiver_id)
+        if before:
+            created_at, msg_id = before
+            q = q.where(or_(Message.created_at < created_at,
+                            and_(Message.created_at == created_at, Message.id < msg_id)))
+        return select(q.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).subquery())
+
+    page = union_all(direction(current_user_id, partner_id), direction(partner_id, current_user_id)).subquery()
+    messages = (db.query(Message)
+                .join(page, Message.id == page.c.id)
+                .options(selectinload(Message.media_items))
+                .order_by(Message.created_at.desc(), Message.id.desc())
+                .limit(limit + 1)
+                .all())
+    return messages[:limit], len(messages) > limit
+
+
+def _subscribe_to_conversation(current_user_id, partner_id, container, open_viewer_func):
+    """Append bubbles for messages of this conversation published by other clients"""
+    client = ui.context.client
+    unsubscribe = None
+
+    def on_message(msg, origin):
+        if container.is_deleted:
+            # The chat area was rebuilt for another partner
+            unsubscribe()
+            return
+        if origin == client.id or {msg.sender_id, msg.receiver_id} != {current_user_id, partner_id}:
+            return
+        _append_message(msg, current_user_id, container, open_viewer_func)
+        if msg.receiver_id == current_user_id:
+            # Seen as it arrived
+            db = SessionLocal()
+            try:
+                mark_read(db, current_user_id, partner_id)
+            finally:
+                db.close()
+
+    unsubscribe = broker.subscribe_client(client, current_user_id, on_message)
+
+
+def _add_load_older(container, current_user_id, partner_id, oldest, open_viewer_func):
+    """Put a "load older" control after the oldest bubble (its visual top)"""
+    state = {'before': (oldest.created_at, oldest.id)}
+    with container:
+        loader = ui.element('div').classes('load-older')
+        with loader:
+            ui.label('Load older messages')
+
+    def load_older():
+        db = SessionLocal()
+        try:
+            messages, has_more = _load_message_page(db, current_user_id, partner_id, before=state['before'])
+        finally:
+            db.close()
+        with container:
+            for msg in messages:
+                create_message_bubble(msg, current_user_id, open_viewer_func)
+        if has_more:
+            state['before'] = (messages[-1].created_at, messages[-1].id)
+            loader.move(target_index=-1)
+        else:
+            loader.delete()
+
+    loader.on('click', load_older)
+    # Click the control when the user scrolls near the top of the history
+    ui.run_javascript(_LOAD_OLDER_ON_SCROLL_JS)
+
+
+_LOAD_OLDER_ON_SCROLL_JS = '''
+    if (!window.chatLoadOlderInstalled) {
+        window.chatLoadOlderInstalled = true;
+        document.addEventListener('scroll', (e) => {
+            const box = e.target;
+            if (!box.classList || !box.classList.contains('custom-messages')) return;
+            // column-reverse: scrollTop is 0 at the bottom and negative above it
+            const fromTop = box.scrollHeight - box.clientHeight - Math.abs(box.scrollTop);
+            const loader = box.querySelector('.load-older');
+            if (!loader || fromTop > 200 || Date.now() - (box.olderAt || 0) < 500) return;
+            box.olderAt = Date.now();
+            loader.click();
+        }, true);
+    }
+'''
+
+
+def _append_message(msg, current_user_id, container, open_viewer_func):
+    """
+    Add one bubble for a just-sent message without rebuilding the history
+
+    The container is flex column-reverse (newest message first in the DOM),
+    so the new bubble goes to index 0.
+    """
+    with container:
+        bubble = create_message_bubble(msg, current_user_id, open_viewer_func)
+    bubble.move(target_index=0)
+    return bubble
 
 
 def _save_uploaded_images(images_to_upload: List[Dict]) -> List[str]:
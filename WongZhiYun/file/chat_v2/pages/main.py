@@ -34,7 +34,7 @@ def main_page(chat_with: Optional[int] = None):
     # Create main layout
     with ui.element('div').classes('custom-container'):
         # Left sidebar
-        conversations_container = create_sidebar(db, current_user_id)
+        conversations = create_sidebar(db, current_user_id)
         
         # Right chat area
         chat_container = create_chat_area()
@@ -44,8 +44,9 @@ def main_page(chat_with: Optional[int] = None):
         # Validate chat_with ID
         if _validate_chat_partner(db, chat_with, current_user_id):
 
-            # Load chat after short delay 
-            ui.timer(0.2, lambda: create_chat_interface(chat_with, chat_container), once=True)
+            # Load chat after short delay; opening it clears its unread badge
+            ui.timer(0.2, lambda: create_chat_interface(
+                chat_with, chat_container, on_read=lambda: conversations.schedule(0)), once=True)
         else:
             # Invalid chat partner, redirect to main page
             ui.navigate.to('/')
@@ -0,0 +1,95 @@
+"""
+Message Broker Service
+"""
+import itertools
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from file.chat_v2.chat_config import config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(getattr(logging, config.LOG_LEVEL.upper()))
+
+
+class MessageBroker:
+    """
+    In-process publish/subscribe keyed by user id
+
+    Every open NiceGUI client subscribes for its logged-in user; send_message
+    publishes each saved message to both participants, so open chats and
+    sidebars update without a reload. All clients of this app live in one
+    process, which is why no external broker is needed.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Dict[int, Callable]] = {}  # user_id -> {token: callback}
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, user_id: int, callback: Callable) -> Callable[[], None]:
+        """
+        Call `callback(message, origin)` for every message published to user_id
+
+        Returns:
+            Callable: Unsubscribe function (safe to call more than once)
+        """
+        token = next(self._tokens)
+        with self._lock:
+            self._subscribers.setdefault(user_id, {})[token] = callback
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._subscribers.get(user_id)
+                if callbacks is not None:
+                    callbacks.pop(token, None)
+                    if not callbacks:
+                        del self._subscribers[user_id]
+        return unsubscribe
+
+    def subscribe_client(self, client, user_id: int, callback: Callable) -> Callable[[], None]:
+        """
+        Subscribe on behalf of a NiceGUI client
+
+        The callback runs inside the client's context (so it can create
+        elements) and the subscription is dropped when the client is deleted.
+        """
+        unsubscribe = self.subscribe(
+            user_id, lambda message, origin: client.safe_invoke(lambda: callback(message, origin)))
+        client.on_delete(unsubscribe)
+        return unsubscribe
+
+    def publish(self, user_id: int, message, origin: Optional[str] = None) -> int:
+        """
+        Deliver a message to every subscriber of user_id
+
+        Args:
+            message: The saved Message (attributes and media already loaded)
+            origin: Id of the client that sent it, so it can skip its own echo
+
+        Returns:
+            int: Number of subscribers notified
+        """
+        with self._lock:
+            callbacks = list(self._subscribers.get(user_id, {}).values())
+            self.published += 1
+        for callback in callbacks:
+            try:
+                callback(message, origin)
+            except Exception as e:
+                logger.error(f"Broker subscriber for user {user_id} failed: {e}")
+        return len(callbacks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'users': len(self._subscribers),
+                'subscriptions': sum(len(c) for c in self._subscribers.values()),
+                'published': self.published,
+            }
+
+
+# Create global broker instance
+broker = MessageBroker()
@@ -0,0 +1,128 @@
+"""
+Conversation Summary Service
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_, text
+
+from file.models import ConversationSummary, User
+
+SNIPPET_LENGTH = 200
+
+# Newest message per (user, partner) for every conversation without a summary
+# (the 8e4b6d1f7a20 migration runs the same statement)
+BACKFILL_SQL = text("""
+    INSERT INTO conversation_summaries (user_id, partner_id, last_message_id, last_message, last_message_at, unread_count)
+    SELECT user_id, partner_id, id, substr(content, 1, 200), created_at, 0
+    FROM (
+        SELECT id, user_id, partner_id, content, created_at,
+               ROW_NUMBER() OVER (PARTITION BY user_id, partner_id ORDER BY created_at DESC, id DESC) AS rn
+        FROM (
+            SELECT id, sender_id AS user_id, receiver_id AS partner_id, content, created_at FROM messages
+            WHERE sender_id IS NOT NULL AND receiver_id IS NOT NULL
+            UNION ALL
+            SELECT id, receiver_id, sender_id, content, created_at FROM messages
+            WHERE sender_id IS NOT NULL AND receiver_id IS NOT NULL
+        ) AS pairs
+    ) AS latest
+    WHERE rn = 1 AND NOT EXISTS (
+        SELECT 1 FROM conversation_summaries s
+        WHERE s.user_id = latest.user_id AND s.partner_id = latest.partner_id
+    )
+""")
+
+
+def record_message(db, msg) -> None:
+    """
+    Update both participants' summaries for a new message
+
+    Call before committing the message, so the message and the summaries are
+    saved in one transaction. The receiver's unread count goes up by one.
+
+    Args:
+        db: Session holding the (flushed or pending) message
+        msg: The new Message
+    """
+    if msg.id is None:
+        db.flush()
+    pairs = [(msg.sender_id, msg.receiver_id), (msg.receiver_id, msg.sender_id)]
+    existing = {
+        (s.user_id, s.partner_id): s
+        for s in db.query(ConversationSummary).filter(or_(
+            *[and_(ConversationSummary.user_id == u, ConversationSummary.partner_id == p) for u, p in pairs]))
+    }
+    for user_id, partner_id in pairs:
+        summary = existing.get((user_id, partner_id))
+        if summary is None:
+            summary = ConversationSummary(user_id=user_id, partner_id=partner_id, unread_count=0)
+            db.add(summary)
+        summary.last_message_id = msg.id
+        summary.last_message = msg.content[:SNIPPET_LENGTH] if msg.content else None
+        summary.last_message_at = msg.created_at or datetime.utcnow()
+        if user_id == msg.receiver_id:
+            summary.unread_count = (summary.unread_count or 0) + 1
+
+
+def backfill_summaries(db) -> int:
+    """
+    Add a summary for every conversation in the message history that has none
+
+    Existing summaries are left alone and new ones start with no unread
+    messages (read state was never stored). Safe to run on every start.
+
+    Returns:
+        int: Number of summaries added
+    """
+    added = db.execute(BACKFILL_SQL).rowcount
+    db.commit()
+    return added
+
+
+def mark_read(db, user_id: int, partner_id: int) -> bool:
+    """
+    Reset the unread count of one conversation and commit
+
+    Returns:
+        bool: Whether there were unread messages
+    """
+    updated = db.query(ConversationSummary).filter(
+        ConversationSummary.user_id == user_id,
+        ConversationSummary.partner_id == partner_id,
+        ConversationSummary.unread_count > 0,
+    ).update({ConversationSummary.unread_count: 0})
+    if updated:
+        db.commit()
+    return bool(updated)
+
+
+def list_conversations(db, user_id: int, search_term: str = "", before: Optional[Tuple] = None,
+                       limit: int = 50) -> Tuple[List[Tuple[ConversationSummary, User]], bool]:
+    """
+    One page of a user's conversations, most recent first
+
+    A single query over ix_conversation_user_last joined to the partner.
+
+    Args:
+        search_term: Only partners whose username contains this text (any case)
+        before: (last_message_at, id) of the last conversation already shown
+
+    Returns:
+        tuple: ([(summary, partner), ...], whether more conversations exist)
+    """
+    query = (db.query(ConversationSummary, User)
+             .join(User, User.id == ConversationSummary.partner_id)
+             .filter(ConversationSummary.user_id == user_id))
+    if search_term:
+        # Checked against the partners of this user only; SQLite lowers both
+        # sides, so the matching is case-insensitive for ASCII letters
+        query = query.filter(User.username.icontains(search_term, autoescape=True))
+    if before:
+        last_at, last_id = before
+        query = query.filter(or_(ConversationSummary.last_message_at < last_at,
+                                 and_(ConversationSummary.last_message_at == last_at,
+                                      ConversationSummary.id < last_id)))
+    rows = (query.order_by(ConversationSummary.last_message_at.desc(), ConversationSummary.id.desc())
+            .limit(limit + 1)
+            .all())
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,44 @@
+from .app.hashing import fingerprint_similarity, load_fingerprints
+from .app.search.hash_index import HashIndex
+
+
+# Near-duplicate detection for new posts.
+# Every post with a hash (pending ones too) lives in an in-memory Hamming
+# index that follows the post change log, so a lookup is a BK-tree radius
+# query instead of a scan of the post table.
+duplicate_index = HashIndex(approved_only=False, name='duplicate_index')
+
+
+def find_duplicate(session, post_id, fingerprints, radius, min_similarity):
+    # Closest earlier post within `radius` pHash bits that also passes the
+    # full fingerprint check; returns (post_id, similarity) or None.
+    # Only earlier posts count, so whichever order the hash workers finish
+    # in, the newer post is the one flagged.
+    duplicate_index.sync(session)
+    candidates = [(pid, d) for pid, d in duplicate_index.within(fingerprints['phash'], radius) if pid < post_id]
+    if not candidates:
+        return None
+
+    from .models import Post
+    posts = {p.id: p for p in session.query(Post).filter(Post.id.in_([pid for pid, _ in candidates]))}
+    best = None
+    for pid, _ in candidates:
+        other = posts.get(pid)
+        if other is None:
+            continue
+        similarity = fingerprint_similarity(fingerprints, load_fingerprints(other.image_hash, other.image_fingerprints))
+        if similarity >= min_similarity and (best is None or similarity > best[1]):
+            best = (pid, similarity)
+    return best
+
+
+def flag_duplicate(session, post, fingerprints, radius=4, min_similarity=0.85):
+    # Mark post.duplicate_of for the admin to review. Nothing is ever deleted
+    # here: the check runs after the user was told the post was submitted, and
+    # a similar image alone doesn't prove two reports are the same.
+    # Returns 'flagged' or None.
+    match = find_duplicate(session, post.id, fingerprints, radius, min_similarity)
+    if match is None:
+        return None
+    post.duplicate_of = match[0]
+    return 'flagged'
@@ -0,0 +1,130 @@
+import os
+import queue
+import threading
+import time
+
+from .app.hashing import compute_fingerprints, dump_fingerprints
+from .duplicates import flag_duplicate
+
+
+# Background fingerprinting of uploaded post images.
+# Requests only enqueue (post_id, filename); a small bounded pool of threads
+# decodes the image and writes post.image_hash / image_fingerprints back, so
+# image search sees new posts without anyone running scripts/update_image_hashes.py.
+# Freshly hashed posts are also checked for near-duplicates (see duplicates.py).
+class HashWorker:
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.duplicates_flagged = 0
+        self.last_lag = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('HASH_WORKERS', 2)
+        app.config.setdefault('HASH_QUEUE_SIZE', 256)
+        app.config.setdefault('DUPLICATE_HASH_RADIUS', 4)
+        app.config.setdefault('DUPLICATE_MIN_SIMILARITY', 0.85)
+        self._queue = queue.Queue(maxsize=app.config['HASH_QUEUE_SIZE'])
+        app.extensions['hash_worker'] = self
+
+    def _start(self):
+        # Threads start on first use so the reloader parent never spawns them
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.app.config['HASH_WORKERS']):
+                t = threading.Thread(target=self._run, name=f'hash-worker-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, post_id, filename):
+        if not filename or self._queue is None:
+            return False
+        self._start()
+        try:
+            self._queue.put_nowait((post_id, filename, time.time()))
+            return True
+        except queue.Full:
+            # The bulk re-hasher will pick the post up later
+            with self._lock:
+                self.dropped += 1
+            self.app.logger.warning(f"Hash queue full, skipped post {post_id}")
+            return False
+
+    def stats(self):
+        depth, oldest = 0, None
+        if self._queue is not None:
+            with self._queue.mutex:
+                depth = len(self._queue.queue)
+                if depth:
+                    oldest = self._queue.queue[0][2]
+        with self._lock:
+            return {
+                'queue_depth': depth,
+                'in_flight': self._in_flight,
+                'workers': len(self._threads),
+                'processed': self.processed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'duplicates_flagged': self.duplicates_flagged,
+                'oldest_wait_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+                'last_lag_seconds': round(self.last_lag, 3) if self.last_lag is not None else None,
+            }
+
+    def _run(self):
+        while True:
+            post_id, filename, enqueued_at = self._queue.get()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                self._hash_post(post_id, filename)
+                with self._lock:
+                    self.processed += 1
+                    self.last_lag = time.time() - enqueued_at
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                self.app.logger.error(f"Hashing post {post_id} failed: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._queue.task_done()
+
+    def _hash_post(self, post_id, filename):
+        from . import db
+        from .models import Post
+
+        path = os.path.join(self.app.root_path, 'static/uploads', filename)
+        fingerprints = compute_fingerprints(path)
+        with self.app.app_context():
+            try:
+                # Only write if the post still points at the same image
+                post = db.session.get(Post, post_id)
+                if post is None or post.image != filename:
+                    return
+                post.image_hash = fingerprints['phash']
+                post.image_fingerprints = dump_fingerprints(fingerprints)
+                db.session.commit()
+
+                result = flag_duplicate(
+                    db.session, post, fingerprints,
+                    radius=self.app.config['DUPLICATE_HASH_RADIUS'],
+                    min_similarity=self.app.config['DUPLICATE_MIN_SIMILARITY'])
+                if result:
+                    db.session.commit()
+                    with self._lock:
+                        self.duplicates_flagged += 1
+            finally:
+                db.session.remove()
+
+
+hash_worker = HashWorker()
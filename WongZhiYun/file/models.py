@@ -34,6 +34,17 @@ class Post(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     is_approved = db.Column(db.Boolean, default=False)
     is_closed = db.Column(db.Boolean, default=False)
+    image_hash = db.Column(db.Text)  # pHash, filled in by the background hash worker
+    image_fingerprints = db.Column(db.Text)  # JSON with the other fingerprints (see app/hashing.py)
+    duplicate_of = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=True)  # set by duplicate detection
+
+    # Feed / profile / admin lists: filter, then newest first
+    __table_args__ = (
+        db.Index('ix_post_approved_type_date', 'is_approved', 'type', 'date_posted'),
+        db.Index('ix_post_approved_date', 'is_approved', 'date_posted'),
+        db.Index('ix_post_user_date', 'user_id', 'date_posted'),
+        db.Index('ix_post_user_approved_date', 'user_id', 'is_approved', 'date_posted'),
+    )
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -44,6 +55,10 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_comment_post_date', 'post_id', 'date_posted'),
+    )
+
 class Message(db.Model):
     __tablename__ = 'messages'  
 
@@ -60,6 +75,32 @@ class Message(db.Model):
 
     media_items = db.relationship('Media', backref='message', cascade='all, delete-orphan')
 
+    # One conversation in time order, and every conversation of a user
+    __table_args__ = (
+        db.Index('ix_messages_pair_created', 'sender_id', 'receiver_id', 'created_at'),
+        db.Index('ix_messages_receiver_created', 'receiver_id', 'created_at'),
+    )
+
+class ConversationSummary(db.Model):
+    # One row per (user, partner): what the chat sidebar lists for `user`.
+    # Written in the same transaction as the message (chat_v2 send_message).
+    __tablename__ = 'conversation_summaries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    partner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    last_message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=True)
+    last_message = db.Column(db.String(200), nullable=True)    # snippet, None for image-only messages
+    last_message_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
+    partner = db.relationship('User', foreign_keys=[partner_id], lazy=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'partner_id', name='uq_conversation_user_partner'),
+        db.Index('ix_conversation_user_last', 'user_id', 'last_message_at'),
+    )
+
 class Media(db.Model):
     __tablename__ = 'media'
     
@@ -9,11 +9,12 @@ cur = conn.cursor()
 
 cur.execute("PRAGMA table_info(post);")
 cols = [c[1] for c in cur.fetchall()]
-if "image_hash" not in cols:
-    cur.execute("ALTER TABLE post ADD COLUMN image_hash TEXT;")
-    conn.commit()
-    print("Added column image_hash to post.")
-else:
-    print("Column already exists.")
+for col, col_type in (("image_hash", "TEXT"), ("image_fingerprints", "TEXT"), ("duplicate_of", "INTEGER")):
+    if col not in cols:
+        cur.execute(f"ALTER TABLE post ADD COLUMN {col} {col_type};")
+        conn.commit()
+        print(f"Added column {col} to post.")
+    else:
+        print(f"Column {col} already exists.")
 
 conn.close()
@@ -0,0 +1,165 @@
+import argparse, io, json, math, os, platform, random, resource, sqlite3, subprocess, sys, time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+bench_search.py
+Purpose: Measure how the search endpoints scale with the number of posts.
+- For every --sizes value a corpus is generated with scripts/generate_corpus.py (kept in --work-dir and reused by later runs).
+- Each size is benchmarked in its own process, so peak RSS is per corpus; search_page, search_api, search_by_image and combined_search are driven through the Flask test client.
+- Reports p50/p95/p99/mean latency, the cold (first) request, SQL statements per request and peak RSS, written as JSON to --out so runs can be diffed between versions.
+Usage: python scripts/bench_search.py [--sizes 1000 10000 100000 1000000] [--requests 50] [--work-dir instance/bench] [--out results.json] [--with-cache]
+"""
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+QUERIES = ["wallet", "black wallet", "key", "earphone", "earfone", "calculater", "blue casio watch", "library",
+           "charger", "notebook left", "silver apple laptop", "umbrela"]
+CATEGORIES = ["", "", "", "Wallet", "Electronics", "Keys"]
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name, timings, queries, errors):
+    cold, warm = timings[0], sorted(timings[1:] or timings)
+    return {
+        'endpoint': name,
+        'requests': len(timings),
+        'errors': errors,
+        'cold_ms': round(cold, 3),
+        'p50_ms': round(percentile(warm, 50), 3),
+        'p95_ms': round(percentile(warm, 95), 3),
+        'p99_ms': round(percentile(warm, 99), 3),
+        'mean_ms': round(sum(warm) / len(warm), 3),
+        'sql_per_request': round(sum(queries[1:] or queries) / len(queries[1:] or queries), 2),
+        'sql_cold': queries[0],
+    }
+
+
+def run_one(args):
+    # Child process: benchmark one corpus and print a JSON result
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(args.db)}"
+    os.environ['HASH_STORE_DIR'] = os.path.abspath(args.db) + '.hash_store'
+    if not args.with_cache:
+        os.environ['SEARCH_CACHE_SIZE'] = '0'
+
+    from sqlalchemy import event
+    from app import create_app, db
+
+    rng = random.Random(args.seed)
+    images = sorted(f for f in os.listdir(args.image_dir) if f.endswith('.jpg'))
+    image_bytes = [open(os.path.join(args.image_dir, f), 'rb').read() for f in rng.sample(images, min(len(images), 64))]
+
+    started = time.perf_counter()
+    app = create_app()
+    startup_ms = (time.perf_counter() - started) * 1000
+    client = app.test_client()
+
+    counter = {'n': 0}
+    with app.app_context():
+        rows = db.session.execute(db.text("SELECT COUNT(*) FROM post")).scalar()
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(*_):
+            counter['n'] += 1
+
+    def image_file():
+        return (io.BytesIO(rng.choice(image_bytes)), 'query.jpg')
+
+    endpoints = [
+        ('search_page', lambda: client.get('/search/', query_string={'q': rng.choice(QUERIES), 'category': rng.choice(CATEGORIES)})),
+        ('search_api', lambda: client.get('/search/api', query_string={'q': rng.choice(QUERIES), 'category': rng.choice(CATEGORIES)})),
+        ('search_by_image', lambda: client.post('/search/by-image', data={'file': image_file()}, content_type='multipart/form-data')),
+        ('combined_search', lambda: client.post('/search/combined', data={'q': rng.choice(QUERIES), 'file': image_file()},
+                                                content_type='multipart/form-data')),
+    ]
+
+    results = []
+    for name, call in endpoints:
+        timings, queries, errors = [], [], 0
+        for _ in range(args.requests):
+            before = counter['n']
+            t0 = time.perf_counter()
+            response = call()
+            timings.append((time.perf_counter() - t0) * 1000)
+            queries.append(counter['n'] - before)
+            if response.status_code != 200:
+                errors += 1
+        results.append(summarize(name, timings, queries, errors))
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    print(json.dumps({'rows': rows, 'startup_ms': round(startup_ms, 3), 'peak_rss_mb': round(peak_mb, 1), 'endpoints': results}))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=SCRIPTS).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search endpoints on synthetic corpora")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--requests', type=int, default=50, help="requests per endpoint and size")
+    parser.add_argument('--work-dir', default="instance/bench")
+    parser.add_argument('--images', type=int, default=200, help="synthetic images per corpus")
+    parser.add_argument('--out', help="result file (default: <work-dir>/bench_results.json)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--with-cache', action='store_true', help="keep the search result cache enabled")
+    parser.add_argument('--db', help=argparse.SUPPRESS)          # internal: child process mode
+    parser.add_argument('--image-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.db:
+        run_one(args)
+        return
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    out = args.out or os.path.join(args.work_dir, 'bench_results.json')
+    image_folder = os.path.join(args.work_dir, 'images')
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'requests_per_endpoint': args.requests,
+        'with_cache': args.with_cache,
+        'results': [],
+    }
+    for size in args.sizes:
+        db_path = os.path.join(args.work_dir, f"corpus_{size}.db")
+        if not os.path.exists(db_path):
+            print(f"Generating {size} rows...")
+            subprocess.run([sys.executable, os.path.join(SCRIPTS, 'generate_corpus.py'), db_path, image_folder,
+                            '--rows', str(size), '--images', str(args.images), '--seed', str(args.seed)], check=True)
+
+        print(f"Benchmarking {size} rows...")
+        child = [sys.executable, os.path.abspath(__file__), '--db', db_path, '--requests', str(args.requests),
+                 '--seed', str(args.seed), '--image-dir', image_folder] + (['--with-cache'] if args.with_cache else [])
+        proc = subprocess.run(child, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr)
+            sys.exit(proc.returncode)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['size'] = size
+        report['results'].append(result)
+        for ep in result['endpoints']:
+            print(f"  {ep['endpoint']:<16} p50 {ep['p50_ms']:>9.2f} ms  p95 {ep['p95_ms']:>9.2f} ms  "
+                  f"p99 {ep['p99_ms']:>9.2f} ms  sql/req {ep['sql_per_request']:>5}")
+        print(f"  peak RSS {result['peak_rss_mb']} MB")
+
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse, os, re, sqlite3, sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import String, and_, create_engine, or_, select, type_coerce
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import configure_mappers, joinedload
+
+from file.models import Comment, ConversationSummary, Message, Post, User, db
+
+"""
+check_query_plans.py
+Purpose: Make sure the hot queries of the site and the chat are served by the index meant for them.
+- Each query is built with the same ORM calls as views.py / chat_v2 and run through EXPLAIN QUERY PLAN.
+- The check fails (exit 1) when a plan doesn't use the query's expected index, has any "SCAN <table>" step (a walk of the whole table, even in index order) or sorts the rows in a temp B-tree instead of reading them in index order.
+- Without a path the schema is created in memory from models.py, so the check covers the indexes declared there; pass instance/users.db to check a real (migrated) database.
+Usage: python scripts/check_query_plans.py [instance/users.db]
+"""
+
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)\w+')
+
+
+def post_page(stmt, cursor=False):
+    # Same shape as views.post_page (first page, or a page after a cursor)
+    posted = type_coerce(Post.date_posted, String)
+    if cursor:
+        stmt = stmt.where(or_(posted < '2025-01-01 00:00:00.000000',
+                              and_(posted == '2025-01-01 00:00:00.000000', Post.id < 100)))
+    return (stmt.options(joinedload(Post.author))
+            .add_columns(posted)
+            .order_by(Post.date_posted.desc(), Post.id.desc())
+            .limit(25))
+
+
+def hot_queries():
+    configure_mappers()     # Post.author is a backref from User
+    approved = select(Post).filter_by(is_approved=True)
+    # (name, expected index, statement)
+    return [
+        ('feed', 'ix_post_approved_date', post_page(approved)),
+        ('feed, next page', 'ix_post_approved_date', post_page(approved, cursor=True)),
+        ('feed by type', 'ix_post_approved_type_date', post_page(approved.filter_by(type='lost'))),
+        ('my posts', 'ix_post_user_date', post_page(select(Post).filter_by(user_id=1))),
+        ('public profile', 'ix_post_user_approved_date',
+            post_page(select(Post).filter_by(user_id=1, is_approved=True), cursor=True)),
+        ('post comments', 'ix_comment_post_date',
+            select(Comment).filter_by(post_id=1).order_by(Comment.date_posted.asc())),
+        ('admin pending', 'ix_post_approved_date', post_page(select(Post).filter_by(is_approved=False))),
+        ('admin pending, next', 'ix_post_approved_date',
+            post_page(select(Post).filter_by(is_approved=False), cursor=True)),
+        # chat history pages read each direction separately (handlers/chat._load_message_page)
+        ('chat history', 'ix_messages_pair_created', select(Message.id, Message.created_at)
+            .where(Message.sender_id == 1, Message.receiver_id == 2)
+            .order_by(Message.created_at.desc(), Message.id.desc()).limit(51)),
+        ('chat sidebar', 'ix_conversation_user_last', select(ConversationSummary, User)
+            .join(User, User.id == ConversationSummary.partner_id)
+            .where(ConversationSummary.user_id == 1)
+            .order_by(ConversationSummary.last_message_at.desc(), ConversationSummary.id.desc()).limit(31)),
+        ('chat sidebar search', 'ix_conversation_user_last', select(ConversationSummary, User)
+            .join(User, User.id == ConversationSummary.partner_id)
+            .where(ConversationSummary.user_id == 1, User.username.icontains('al', autoescape=True))
+            .order_by(ConversationSummary.last_message_at.desc(), ConversationSummary.id.desc()).limit(31)),
+    ]
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=sqlite.dialect())
+    params = [compiled.params[name] for name in compiled.positiontup]
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a hot query misses its index, scans a table or sorts")
+    parser.add_argument('db_path', nargs='?', help="database to check (default: fresh schema from models.py)")
+    args = parser.parse_args()
+
+    if args.db_path:
+        if not os.path.exists(args.db_path):
+            print(f"{args.db_path} does not exist.")
+            sys.exit(1)
+        conn = sqlite3.connect(f"file:{args.db_path}?mode=ro", uri=True)
+    else:
+        engine = create_engine("sqlite://")
+        db.metadata.create_all(engine)
+        conn = engine.raw_connection().driver_connection
+
+    failures = 0
+    for name, index, stmt in hot_queries():
+        plan = explain(conn, stmt)
+        scans = [step for step in plan if FULL_SCAN.match(step)]
+        uses_index = any(re.search(rf'\bINDEX {index}\b', step) for step in plan)
+        sorts = [step for step in plan if "TEMP B-TREE" in step]
+        if scans:
+            status = "FULL SCAN"
+        elif sorts:
+            status = "SORTS"
+        elif not uses_index:
+            status = f"NOT USING {index}"
+        else:
+            status = "ok"
+        failures += status != "ok"
+        print(f"{name:<20} {status}")
+        for step in plan:
+            note = "  <-- full scan" if step in scans else ("  <-- sort" if step in sorts else "")
+            print(f"    {step}{note}")
+
+    conn.close()
+    if failures:
+        print(f"{failures} hot quer{'y' if failures == 1 else 'ies'} failed the plan check.")
+        sys.exit(1)
+    print("All hot queries use their index.")
+
+
+if __name__ == "__main__":
+    main()
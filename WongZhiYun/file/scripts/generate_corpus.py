@@ -0,0 +1,114 @@
+import argparse, os, random, sqlite3, sys, time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+from sqlalchemy import create_engine
+
+from app.hashing import compute_fingerprints, dump_fingerprints
+from app.models import Report
+
+"""
+generate_corpus.py
+Purpose: Build a synthetic search corpus (post rows + images + hashes) for scripts/bench_search.py.
+- Rows get random titles/descriptions/locations/categories from small vocabularies, so keyword searches hit realistic match sets.
+- A fixed pool of synthetic images is drawn and fingerprinted once; every post points at one of them with a few pHash bits flipped, so the hash index holds N distinct hashes.
+Usage: python scripts/generate_corpus.py out.db out_images/ --rows 10000 [--images 200] [--seed 1]
+"""
+
+ITEMS = ["wallet", "key", "earphone", "calculator", "umbrella", "bottle", "phone", "charger", "laptop",
+         "mouse", "pencil", "notebook", "jacket", "cap", "watch", "glasses", "card", "bag", "headphone", "plush"]
+COLOURS = ["black", "white", "red", "blue", "green", "grey", "pink", "brown", "silver", "yellow"]
+BRANDS = ["casio", "apple", "samsung", "xiaomi", "sony", "nike", "adidas", "uniqlo", "logitech", "jbl"]
+LOCATIONS = ["FCI", "FOE", "FOM", "Library", "CLC", "DTC", "Cafeteria", "Surau", "Hostel", "Sports Complex"]
+CATEGORIES = ["Bag", "Wallet", "Keys", "Clothes", "Electronics", "Stationery", "Others"]
+WORDS = ["left", "near", "table", "floor", "lecture", "hall", "room", "after", "class", "found", "lost",
+         "sticker", "scratch", "case", "strap", "small", "large", "name", "inside", "morning", "evening"]
+
+BATCH = 5000
+
+
+def draw_image(rng, path, size=128):
+    # Random shapes on a random background, different enough to give distinct hashes
+    img = Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randrange(3, 9)):
+        x0, y0 = rng.randrange(size), rng.randrange(size)
+        x1, y1 = x0 + rng.randrange(8, size // 2), y0 + rng.randrange(8, size // 2)
+        colour = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle([x0, y0, x1, y1], fill=colour)
+        else:
+            draw.ellipse([x0, y0, x1, y1], fill=colour)
+    img.save(path, "JPEG", quality=85)
+
+
+def make_images(rng, folder, count):
+    # Returns [(filename, phash int, fingerprints json)]
+    os.makedirs(folder, exist_ok=True)
+    pool = []
+    for i in range(count):
+        name = f"synthetic_{i:05d}.jpg"
+        path = os.path.join(folder, name)
+        if not os.path.exists(path):
+            draw_image(rng, path)
+        fingerprints = compute_fingerprints(path)
+        pool.append((name, int(fingerprints['phash'], 16), dump_fingerprints(fingerprints)))
+    return pool
+
+
+def make_row(rng, pool, now):
+    item, colour, brand = rng.choice(ITEMS), rng.choice(COLOURS), rng.choice(BRANDS)
+    title = f"{colour} {brand} {item}"
+    description = f"{colour} {item} " + " ".join(rng.choice(WORDS) for _ in range(rng.randrange(6, 20)))
+    posted = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+    image = image_hash = fingerprints = None
+    if pool and rng.random() < 0.8:
+        image, phash, fingerprints = rng.choice(pool)
+        for _ in range(rng.randrange(0, 4)):
+            phash ^= 1 << rng.randrange(64)
+        image_hash = f"{phash:016x}"
+    return (title, description, rng.choice(["lost", "found"]), rng.choice(LOCATIONS), rng.choice(CATEGORIES),
+            image, posted.strftime("%Y-%m-%d %H:%M:%S.%f"), rng.randrange(1, 500), rng.random() < 0.9,
+            image_hash, fingerprints)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic post corpus for benchmarks")
+    parser.add_argument('db_path')
+    parser.add_argument('image_folder')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db_path):
+        print(f"{args.db_path} already exists, refusing to overwrite it.")
+        sys.exit(1)
+
+    rng = random.Random(args.seed)
+    started = time.time()
+    pool = make_images(rng, args.image_folder, args.images)
+    print(f"{len(pool)} images ready in {time.time() - started:.1f}s")
+
+    # Same post schema the search service maps (FTS + change log are added by create_app)
+    Report.__table__.create(create_engine(f"sqlite:///{os.path.abspath(args.db_path)}"))
+
+    conn = sqlite3.connect(args.db_path)
+    now = datetime(2025, 1, 1)
+    done = 0
+    while done < args.rows:
+        batch = [make_row(rng, pool, now) for _ in range(min(BATCH, args.rows - done))]
+        with conn:
+            conn.executemany(
+                "INSERT INTO post (title, description, type, location, category, image, date_posted, user_id, "
+                "is_approved, image_hash, image_fingerprints) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        done += len(batch)
+        print(f"Inserted {done}/{args.rows} rows")
+    conn.close()
+    print(f"Done in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
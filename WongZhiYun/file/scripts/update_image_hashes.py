@@ -1,34 +1,133 @@
-import sqlite3, os, sys
-from PIL import Image
-import imagehash
-
-# Get database path (argument 1) or default to "instance/users.db"
-db_path = sys.argv[1] if len(sys.argv) > 1 else "instance/users.db"
-# Get upload folder (argument 2) or default to "app/static/uploads"
-upload_folder = sys.argv[2] if len(sys.argv) > 2 else "app/static/uploads"
-
-conn = sqlite3.connect(db_path)
-cur = conn.cursor()
-
-# Select all post IDs and their image filenames
-rows = cur.execute("SELECT id, image FROM post").fetchall()
-print(f"Found {len(rows)} rows")
-
-for rid, imgname in rows:
-    if not imgname:  # Skip if no image 
-        continue
-    path = os.path.join(upload_folder, imgname)
-    if not os.path.exists(path):   # If file does not exist, print message
-        print("No file", path)
-        continue
+import argparse, hashlib, io, os, sqlite3, sys, time
+from multiprocessing import Pool
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.hashing import compute_fingerprints, dump_fingerprints
+
+"""
+update_image_hashes.py
+Purpose: Bulk (re)compute post.image_hash and post.image_fingerprints for every uploaded image.
+- Decoding + fingerprinting run in a process pool, results are written back in batched executemany transactions.
+- image_hash_state remembers size/mtime/sha256 of every hashed file, so unchanged files are skipped and an interrupted run resumes where it stopped.
+Usage: python scripts/update_image_hashes.py [db_path] [upload_folder] [--workers N] [--batch-size N] [--force]
+"""
+
+STATE_DDL = """
+CREATE TABLE IF NOT EXISTS image_hash_state (
+    image TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    image_hash TEXT NOT NULL,
+    fingerprints TEXT
+)
+"""
+
+
+def hash_file(job):
+    # Runs in a worker process: digest the bytes, decode + fingerprint only if the content changed
+    image, path, size, mtime_ns, known_sha, known_hash, known_fp = job
     try:
-        # Open image, convert to RGB, compute perceptual hash (pHash) 
-        h = str(imagehash.phash(Image.open(path).convert("RGB")))
-        cur.execute("UPDATE post SET image_hash=? WHERE id=?", (h, rid))
-        print(f"Updated {rid} {imgname} hash {h}")
+        with open(path, 'rb') as f:
+            data = f.read()
+        sha = hashlib.sha256(data).hexdigest()
+        if sha == known_sha:
+            return image, size, mtime_ns, sha, known_hash, known_fp, None
+        fingerprints = compute_fingerprints(io.BytesIO(data))
+        return image, size, mtime_ns, sha, fingerprints['phash'], dump_fingerprints(fingerprints), None
     except Exception as e:
-        print("Error", imgname, e)
+        return image, size, mtime_ns, None, None, None, str(e)
+
+
+def plan(cur, upload_folder, force):
+    # Decide which files need hashing; returns (jobs, ready, post ids per image, skipped count)
+    posts_by_image = {}
+    current = {}
+    for rid, image, image_hash, fingerprints in cur.execute("SELECT id, image, image_hash, image_fingerprints FROM post WHERE image IS NOT NULL AND image != ''"):
+        posts_by_image.setdefault(image, []).append(rid)
+        current[rid] = (image_hash, fingerprints)
+
+    state = {row[0]: row[1:] for row in cur.execute("SELECT image, size, mtime_ns, sha256, image_hash, fingerprints FROM image_hash_state")}
+
+    jobs, ready, skipped = [], [], 0
+    for image, post_ids in posts_by_image.items():
+        path = os.path.join(upload_folder, image)
+        try:
+            st = os.stat(path)
+        except OSError:
+            print("No file", path)
+            continue
+        known = state.get(image)
+        if known and known[4] is None:
+            known = None  # recorded before fingerprints existed
+        if known and not force and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            # Same size + mtime: trust the stored hashes, no need to read the file
+            if all(current[rid] == (known[3], known[4]) for rid in post_ids):
+                skipped += 1
+            else:
+                ready.append((image, known[3], known[4]))
+            continue
+        known_sha, known_hash, known_fp = known[2:] if known and not force else (None, None, None)
+        jobs.append((image, path, st.st_size, st.st_mtime_ns, known_sha, known_hash, known_fp))
+    return jobs, ready, posts_by_image, skipped
+
+
+def flush(conn, post_updates, state_rows):
+    # One transaction per batch, so a crash loses at most one batch of work
+    with conn:
+        if post_updates:
+            conn.executemany("UPDATE post SET image_hash=?, image_fingerprints=? WHERE id=?", post_updates)
+        if state_rows:
+            conn.executemany("INSERT OR REPLACE INTO image_hash_state (image, size, mtime_ns, sha256, image_hash, fingerprints) VALUES (?, ?, ?, ?, ?, ?)", state_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk (re)compute post image hashes")
+    parser.add_argument('db_path', nargs='?', default="instance/users.db")
+    parser.add_argument('upload_folder', nargs='?', default="app/static/uploads")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--force', action='store_true', help="ignore stored size/mtime/digest and rehash everything")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    cur = conn.cursor()
+    if "image_fingerprints" not in [c[1] for c in cur.execute("PRAGMA table_info(post);")]:
+        print("post.image_fingerprints is missing, run scripts/add_image_hash_column.py first.")
+        sys.exit(1)
+    conn.execute(STATE_DDL)
+    # State tables created before fingerprints existed
+    if "fingerprints" not in [c[1] for c in cur.execute("PRAGMA table_info(image_hash_state);")]:
+        cur.execute("ALTER TABLE image_hash_state ADD COLUMN fingerprints TEXT;")
+
+    jobs, ready, posts_by_image, skipped = plan(cur, args.upload_folder, args.force)
+    print(f"Found {len(posts_by_image)} images: {len(jobs)} to hash, {len(ready)} to copy from state, {skipped} unchanged")
+
+    # Posts whose file is unchanged but whose hash column is stale
+    flush(conn, [(h, fp, rid) for image, h, fp in ready for rid in posts_by_image[image]], [])
+
+    started = time.time()
+    done = errors = 0
+    post_updates, state_rows = [], []
+    with Pool(processes=max(1, args.workers)) as pool:
+        for image, size, mtime_ns, sha, image_hash, fingerprints, error in pool.imap_unordered(hash_file, jobs, chunksize=16):
+            if error:
+                errors += 1
+                print("Error", image, error)
+                continue
+            post_updates.extend((image_hash, fingerprints, rid) for rid in posts_by_image[image])
+            state_rows.append((image, size, mtime_ns, sha, image_hash, fingerprints))
+            done += 1
+            if len(state_rows) >= args.batch_size:
+                flush(conn, post_updates, state_rows)
+                post_updates, state_rows = [], []
+                print(f"Hashed {done}/{len(jobs)} ({done / (time.time() - started):.0f} images/s)")
+    flush(conn, post_updates, state_rows)
+
+    print(f"Done: {done} hashed, {errors} errors in {time.time() - started:.1f}s")
+    conn.close()
+
 
-# Commit all updates and close connection 
-conn.commit()
-conn.close()
+if __name__ == "__main__":
+    main()
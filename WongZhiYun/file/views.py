@@ -1,13 +1,46 @@
-from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash
+from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, jsonify
 from flask_login import login_required, current_user
 from .models import Post, db, Comment, User
 from werkzeug.utils import secure_filename
 import os
-from sqlalchemy import func
+from sqlalchemy import String, and_, or_, type_coerce
+from sqlalchemy.orm import joinedload
+from .hash_worker import hash_worker
+from .caching import card_cache, conditional_page, dashboard_stats, invalidate_dashboard_stats
 
 
 views = Blueprint('views', __name__)
 
+POSTS_PER_PAGE = 24
+ADMIN_PAGE_SIZE = 20
+
+
+def post_page(query, per_page=POSTS_PER_PAGE, param='cursor'):
+    # Newest-first page of posts with their authors loaded in the same query.
+    # ?cursor=<date_posted>|<id> continues after the last post of the previous
+    # page, so every page costs the same. Returns (posts, url of the next page).
+    # `param` names the cursor argument when one page shows several lists.
+    posted = type_coerce(Post.date_posted, String)  # compare the stored text
+    cursor = request.args.get(param, '')
+    if '|' in cursor:
+        last_posted, _, last_id = cursor.rpartition('|')
+        if last_id.isdigit():
+            query = query.filter(or_(posted < last_posted, and_(posted == last_posted, Post.id < int(last_id))))
+
+    rows = (query.options(joinedload(Post.author))
+            .add_columns(posted)
+            .order_by(Post.date_posted.desc(), Post.id.desc())
+            .limit(per_page + 1)
+            .all())
+    posts = [post for post, _ in rows[:per_page]]
+    next_url = None
+    if len(rows) > per_page:
+        post, last_posted = rows[per_page - 1]
+        args = dict(request.view_args, **request.args.to_dict())
+        args[param] = f"{last_posted}|{post.id}"
+        next_url = url_for(request.endpoint, **args)
+    return posts, next_url
+
 @views.route('/')
 def home():
     if current_user.is_authenticated:
@@ -44,6 +77,11 @@ def report_post():
             )
         db.session.add(new_post)
         db.session.commit()
+        invalidate_dashboard_stats()
+
+        # Hash the image off the request path
+        if filename:
+            hash_worker.submit(new_post.id, filename)
 
         flash("Posts created! Waiting for approve!", "success")
         return redirect(url_for('views.feed'))
@@ -51,30 +89,29 @@ def report_post():
     return render_template('report.html')
 
 @views.route('/feed')
+@conditional_page
 def feed():
     filter_type = request.args.get('type', 'all')
     
-    if filter_type == 'lost':
-        posts = Post.query.filter_by(type='lost',is_approved=True).order_by(Post.date_posted.desc()).all()
-    elif filter_type == 'found':
-        posts = Post.query.filter_by(type='found',is_approved=True).order_by(Post.date_posted.desc()).all()
-    else:
-        posts = Post.query.filter_by(is_approved=True).order_by(Post.date_posted.desc()).all()
+    query = Post.query.filter_by(is_approved=True)
+    if filter_type in ('lost', 'found'):
+        query = query.filter_by(type=filter_type)
+    posts, next_url = post_page(query)
 
-    return render_template("feed.html", posts=posts, filter_type=filter_type)
+    return render_template("feed.html", posts=posts, filter_type=filter_type, next_url=next_url)
 
 
 @views.route('/my_posts')
 @login_required
 def my_posts():
-    posts = Post.query.filter_by(user_id=current_user.id).order_by(Post.date_posted.desc()).all()
-    return render_template('feed.html',posts=posts,filter_type='all')
+    posts, next_url = post_page(Post.query.filter_by(user_id=current_user.id))
+    return render_template('feed.html',posts=posts,filter_type='all',next_url=next_url)
 
 @views.route('/profile')
 @login_required
 def profile():
-    posts = Post.query.filter_by(user_id=current_user.id).order_by(Post.date_posted.desc()).all()
-    return render_template('profile.html', user=current_user, posts=posts)
+    posts, next_url = post_page(Post.query.filter_by(user_id=current_user.id))
+    return render_template('profile.html', user=current_user, posts=posts, next_url=next_url)
 
 
 @views.route('/edit_profile', methods=['GET', 'POST'])
@@ -107,6 +144,7 @@ def edit_profile():
 
 @views.route('/post/<int:post_id>', methods=['GET', 'POST'])
 @login_required
+@conditional_page
 def post_detail(post_id):
     post = Post.query.get_or_404(post_id)
 
@@ -124,10 +162,11 @@ def post_detail(post_id):
     return render_template('post_detail.html', post=post, comments=comments)
 
 @views.route('/profile/<int:user_id>')
+@conditional_page
 def public_profile(user_id):
     user = User.query.get_or_404(user_id)
-    posts = Post.query.filter_by(user_id=user.id, is_approved=True).order_by(Post.date_posted.desc()).all()
-    return render_template('profile.html', user=user, posts=posts)
+    posts, next_url = post_page(Post.query.filter_by(user_id=user.id, is_approved=True))
+    return render_template('profile.html', user=user, posts=posts, next_url=next_url)
 
 @views.route('/close_post/<int:post_id>', methods=['POST'])
 @login_required
@@ -139,6 +178,7 @@ def close_post(post_id):
 
     post.is_closed = True
     db.session.commit()
+    card_cache.invalidate(post.id)
     flash("Post marked as founded.", "success")
     return redirect(url_for('views.profile'))
 
@@ -149,29 +189,20 @@ def admin_dashboard():
         flash("Unauthorized access", "danger")
         return redirect(url_for('views.home'))
 
-    # Pending & approved posts
-    pending_posts = Post.query.filter_by(is_approved=False).order_by(Post.date_posted.desc()).all()
-    approved_posts = Post.query.filter_by(is_approved=True).order_by(Post.date_posted.desc()).all()
+    # Pending & approved posts, one page of each (paged independently)
+    pending_posts, pending_next = post_page(Post.query.filter_by(is_approved=False), ADMIN_PAGE_SIZE, 'pending')
+    approved_posts, approved_next = post_page(Post.query.filter_by(is_approved=True), ADMIN_PAGE_SIZE, 'approved')
 
-    # Counts for overview
-    pending_count = len(pending_posts)
-    approved_count = len(approved_posts)
-
-    # Group by type (Lost, Found, etc.)
-    type_counts = (
-        db.session.query(Post.type, func.count(Post.id))
-        .group_by(Post.type)
-        .all()
-    )
-    type_data = {t: c for t, c in type_counts}  # dict: {"Lost": 5, "Found": 7, "Other": 2}
+    # Counts for overview and the by-type chart, e.g. type_data = {"lost": 5, "found": 7}
+    stats = dashboard_stats()
 
     return render_template(
         "admin.html",
         pending_posts=pending_posts,
         approved_posts=approved_posts,
-        pending_count=pending_count,
-        approved_count=approved_count,
-        type_data=type_data
+        pending_next=pending_next,
+        approved_next=approved_next,
+        **stats
     )
 @views.route('/admin/approve_post/<int:post_id>', methods=['POST'])
 @login_required
@@ -183,9 +214,23 @@ def approve_post(post_id):
     post = Post.query.get_or_404(post_id)
     post.is_approved = True
     db.session.commit()
+    invalidate_dashboard_stats()
+    card_cache.invalidate(post.id)
+
+    # Make sure approved posts become searchable by image
+    if post.image and not (post.image_hash and post.image_fingerprints):
+        hash_worker.submit(post.id, post.image)
+
     flash("Post approved successfully!", "success")
     return redirect(url_for('views.admin_dashboard'))
 
+@views.route('/admin/hash_queue')
+@login_required
+def hash_queue_stats():
+    if current_user.role != "admin":
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(hash_worker.stats())
+
 @views.route('/admin/delete_post/<int:post_id>', methods=['POST'])
 @login_required
 def delete_post(post_id):
@@ -194,7 +239,11 @@ def delete_post(post_id):
         return redirect(url_for('views.home'))
 
     post = Post.query.get_or_404(post_id)
+    # Posts flagged as duplicates of this one lose the flag rather than point at nothing
+    Post.query.filter_by(duplicate_of=post.id).update({Post.duplicate_of: None})
     db.session.delete(post)
     db.session.commit()
+    invalidate_dashboard_stats()
+    card_cache.invalidate(post_id)
     flash("Post deleted successfully!", "success")
     return redirect(url_for('views.admin_dashboard'))
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""post image hash columns
+
+Revision ID: 1a7e5c3b9d04
+Revises: 
+Create Date: 2026-10-18 09:48:02.117530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a7e5c3b9d04'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Databases created by db.create_all() (or patched with
+# scripts/add_image_hash_column.py) may already have some of these,
+# so only the missing pieces are added.
+COLUMNS = [
+    ('image_hash', sa.Text()),
+    ('image_fingerprints', sa.Text()),
+    ('duplicate_of', sa.Integer()),
+]
+DUPLICATE_FK = 'fk_post_duplicate_of_post'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {c['name'] for c in inspector.get_columns('post')}
+    has_fk = any(fk['constrained_columns'] == ['duplicate_of'] for fk in inspector.get_foreign_keys('post'))
+
+    # SQLite can't add a foreign key in place; batch mode rebuilds the table
+    with op.batch_alter_table('post') as batch_op:
+        for name, type_ in COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+        if not has_fk:
+            batch_op.create_foreign_key(DUPLICATE_FK, 'post', ['duplicate_of'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('post') as batch_op:
+        for name, _ in reversed(COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,37 @@
+"""composite indexes for hot queries
+
+Revision ID: 3c1f0a9d2b71
+Revises: 1a7e5c3b9d04
+Create Date: 2026-10-18 10:12:41.305118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f0a9d2b71'
+down_revision = '1a7e5c3b9d04'
+branch_labels = None
+depends_on = None
+
+# Databases created after this revision already get these from db.create_all(),
+# so both directions tolerate the index being there (or not) already.
+INDEXES = [
+    ('ix_post_approved_type_date', 'post', ['is_approved', 'type', 'date_posted']),
+    ('ix_post_approved_date', 'post', ['is_approved', 'date_posted']),
+    ('ix_post_user_date', 'post', ['user_id', 'date_posted']),
+    ('ix_comment_post_date', 'comment', ['post_id', 'date_posted']),
+    ('ix_messages_pair_created', 'messages', ['sender_id', 'receiver_id', 'created_at']),
+    ('ix_messages_receiver_created', 'messages', ['receiver_id', 'created_at']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,67 @@
+"""conversation summaries for the chat sidebar
+
+Revision ID: 8e4b6d1f7a20
+Revises: 3c1f0a9d2b71
+Create Date: 2026-10-18 13:05:27.912664
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4b6d1f7a20'
+down_revision = '3c1f0a9d2b71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # db.create_all() may have created the (empty) table already
+    if not sa.inspect(bind).has_table('conversation_summaries'):
+        op.create_table(
+            'conversation_summaries',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('partner_id', sa.Integer(), nullable=False),
+            sa.Column('last_message_id', sa.Integer(), nullable=True),
+            sa.Column('last_message', sa.String(length=200), nullable=True),
+            sa.Column('last_message_at', sa.DateTime(), nullable=False),
+            sa.Column('unread_count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.ForeignKeyConstraint(['partner_id'], ['user.id']),
+            sa.ForeignKeyConstraint(['last_message_id'], ['messages.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'partner_id', name='uq_conversation_user_partner'),
+        )
+        op.create_index('ix_conversation_user_last', 'conversation_summaries', ['user_id', 'last_message_at'])
+
+    # Backfill from the message history: newest message per (user, partner)
+    # for every pair without a summary. The chat app may already have written
+    # summaries for new messages, so existing rows are kept and only missing
+    # pairs are added. Read state was never stored, so they start with no unread messages.
+    bind.execute(sa.text("""
+        INSERT INTO conversation_summaries (user_id, partner_id, last_message_id, last_message, last_message_at, unread_count)
+        SELECT user_id, partner_id, id, substr(content, 1, 200), created_at, 0
+        FROM (
+            SELECT id, user_id, partner_id, content, created_at,
+                   ROW_NUMBER() OVER (PARTITION BY user_id, partner_id ORDER BY created_at DESC, id DESC) AS rn
+            FROM (
+                SELECT id, sender_id AS user_id, receiver_id AS partner_id, content, created_at FROM messages
+                WHERE sender_id IS NOT NULL AND receiver_id IS NOT NULL
+                UNION ALL
+                SELECT id, receiver_id, sender_id, content, created_at FROM messages
+                WHERE sender_id IS NOT NULL AND receiver_id IS NOT NULL
+            ) AS pairs
+        ) AS latest
+        WHERE rn = 1 AND NOT EXISTS (
+            SELECT 1 FROM conversation_summaries s
+            WHERE s.user_id = latest.user_id AND s.partner_id = latest.partner_id
+        )
+    """))
+
+
+def downgrade():
+    op.drop_index('ix_conversation_user_last', table_name='conversation_summaries')
+    op.drop_table('conversation_summaries')
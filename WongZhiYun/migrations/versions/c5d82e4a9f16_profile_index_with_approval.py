@@ -0,0 +1,30 @@
+"""profile index with approval
+
+Revision ID: c5d82e4a9f16
+Revises: 8e4b6d1f7a20
+Create Date: 2026-10-18 17:21:06.584211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d82e4a9f16'
+down_revision = '8e4b6d1f7a20'
+branch_labels = None
+depends_on = None
+
+# With only (user_id, date_posted) the public profile query (user_id = ? AND
+# is_approved = 1) was planned on ix_post_approved_date instead, which walks
+# every approved post. is_approved in the index makes both filters equalities.
+# ix_post_user_date stays for "my posts" (every post of a user, newest first).
+
+
+def upgrade():
+    op.create_index('ix_post_user_approved_date', 'post', ['user_id', 'is_approved', 'date_posted'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_post_user_approved_date', table_name='post', if_exists=True)
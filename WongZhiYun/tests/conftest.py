@@ -0,0 +1,22 @@
+import os, sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, configure_mappers
+
+from file.app.search.changes import install_change_log
+from file.models import db
+
+
+@pytest.fixture
+def session():
+    # Fresh in-memory database with the models' schema and the post change log
+    configure_mappers()
+    engine = create_engine("sqlite://")
+    db.metadata.create_all(engine)
+    install_change_log(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
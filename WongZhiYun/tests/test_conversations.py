@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from file.chat_v2.services.conversations import backfill_summaries, list_conversations, mark_read, record_message
+from file.models import ConversationSummary, Message, User
+
+START = datetime(2025, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def users(session):
+    names = ['alice', 'bob', 'carol', 'dave']
+    users = [User(email=f'{name}@example.com', password='x', username=name) for name in names]
+    session.add_all(users)
+    session.commit()
+    return users
+
+
+def send(session, sender, receiver, content, minutes):
+    msg = Message(sender_id=sender.id, receiver_id=receiver.id, content=content,
+                  created_at=START + timedelta(minutes=minutes))
+    session.add(msg)
+    record_message(session, msg)
+    session.commit()
+    return msg
+
+
+def summary(session, user, partner):
+    return session.query(ConversationSummary).filter_by(user_id=user.id, partner_id=partner.id).one()
+
+
+def test_record_message_updates_both_sides(session, users):
+    alice, bob = users[:2]
+    send(session, alice, bob, 'Found your wallet', 0)
+    reply = send(session, bob, alice, 'Thanks!', 1)
+    send(session, bob, alice, 'Where are you?', 2)
+
+    mine, theirs = summary(session, alice, bob), summary(session, bob, alice)
+    assert mine.last_message == theirs.last_message == 'Where are you?'
+    assert mine.last_message_id == reply.id + 1
+    assert mine.unread_count == 2
+    assert theirs.unread_count == 1
+    assert session.query(ConversationSummary).count() == 2
+
+
+def test_mark_read_resets_only_that_conversation(session, users):
+    alice, bob, carol = users[:3]
+    send(session, bob, alice, 'Hi', 0)
+    send(session, carol, alice, 'Hello', 1)
+
+    assert mark_read(session, alice.id, bob.id)
+    assert not mark_read(session, alice.id, bob.id)
+
+    assert summary(session, alice, bob).unread_count == 0
+    assert summary(session, alice, carol).unread_count == 1
+
+
+def test_list_conversations_pages_newest_first(session, users):
+    alice, bob, carol, dave = users
+    send(session, alice, bob, 'one', 0)
+    send(session, carol, alice, 'two', 1)
+    send(session, alice, dave, 'three', 2)
+
+    rows, has_more = list_conversations(session, alice.id, limit=2)
+    assert [partner.username for _, partner in rows] == ['dave', 'carol']
+    assert has_more
+
+    last = rows[-1][0]
+    rows, has_more = list_conversations(session, alice.id, before=(last.last_message_at, last.id), limit=2)
+    assert [partner.username for _, partner in rows] == ['bob']
+    assert not has_more
+
+
+def test_list_conversations_search_ignores_case(session, users):
+    alice, bob, carol = users[:3]
+    send(session, alice, bob, 'one', 0)
+    send(session, alice, carol, 'two', 1)
+
+    rows, _ = list_conversations(session, alice.id, search_term='CA')
+    assert [partner.username for _, partner in rows] == ['carol']
+
+
+def test_list_conversations_search_matches_inside_names(session, users):
+    alice, bob = users[:2]
+    bigjohn = User(email='bigjohn@example.com', password='x', username='BigJohn_99')
+    session.add(bigjohn)
+    session.commit()
+    send(session, alice, bob, 'one', 0)
+    send(session, alice, bigjohn, 'two', 1)
+
+    assert [p.username for _, p in list_conversations(session, alice.id, search_term='john')[0]] == ['BigJohn_99']
+    assert [p.username for _, p in list_conversations(session, alice.id, search_term='n_9')[0]] == ['BigJohn_99']
+    assert list_conversations(session, alice.id, search_term='%')[0] == []
+
+
+def test_backfill_adds_only_missing_conversations(session, users):
+    alice, bob, carol = users[:3]
+    session.add_all([
+        Message(sender_id=alice.id, receiver_id=bob.id, content='old', created_at=START),
+        Message(sender_id=bob.id, receiver_id=alice.id, content='older reply', created_at=START + timedelta(minutes=1)),
+        Message(sender_id=carol.id, receiver_id=alice.id, content='hi', created_at=START + timedelta(minutes=2)),
+    ])
+    session.commit()
+    send(session, alice, carol, 'new', 3)     # written by the chat app before the backfill ran
+
+    assert backfill_summaries(session) == 2
+    assert backfill_summaries(session) == 0
+
+    assert summary(session, alice, bob).last_message == 'older reply'
+    assert summary(session, bob, alice).last_message == 'older reply'
+    assert summary(session, alice, carol).last_message == 'new'
+    assert summary(session, alice, carol).unread_count == 0
+    assert summary(session, carol, alice).unread_count == 1
@@ -0,0 +1,79 @@
+import pytest
+
+from file import duplicates
+from file.app.hashing import dump_fingerprints
+from file.app.search.hash_index import HashIndex
+from file.models import Post, User
+
+FINGERPRINTS = {'phash': 'f0f0f0f00f0f0f0f', 'dhash': '0123456789abcdef', 'ahash': 'ffff0000ffff0000',
+                'whash': 'aaaa5555aaaa5555', 'hist': '10' * 64}
+OTHER = {'phash': '0f0f0f0ff0f0f0f0', 'dhash': 'fedcba9876543210', 'ahash': '0000ffff0000ffff',
+         'whash': '5555aaaa5555aaaa', 'hist': '01' * 64}
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(duplicates, 'duplicate_index', HashIndex(approved_only=False))
+
+
+def add_post(session, user, fingerprints, **fields):
+    post = Post(title=fields.pop('title', 'Blue umbrella'), description=fields.pop('description', 'Left in FCI'),
+                type=fields.pop('type', 'lost'), author=user, image='x.jpg',
+                image_hash=fingerprints['phash'], image_fingerprints=dump_fingerprints(fingerprints), **fields)
+    session.add(post)
+    session.commit()
+    return post
+
+
+@pytest.fixture
+def users(session):
+    alice = User(email='alice@example.com', password='x', username='alice')
+    bob = User(email='bob@example.com', password='x', username='bob')
+    session.add_all([alice, bob])
+    session.commit()
+    return alice, bob
+
+
+def test_resubmission_of_own_pending_post_is_flagged_not_deleted(session, users):
+    alice, _ = users
+    original = add_post(session, alice, FINGERPRINTS)
+    copy = add_post(session, alice, FINGERPRINTS)
+
+    assert duplicates.flag_duplicate(session, copy, FINGERPRINTS) == 'flagged'
+    session.commit()
+
+    assert session.get(Post, copy.id) is not None
+    assert copy.duplicate_of == original.id
+    assert original.duplicate_of is None
+
+
+def test_original_hashed_last_is_not_flagged(session, users):
+    alice, _ = users
+    original = add_post(session, alice, FINGERPRINTS)
+    copy = add_post(session, alice, FINGERPRINTS)
+
+    # The resubmission's hash worker finishes first
+    assert duplicates.flag_duplicate(session, copy, FINGERPRINTS) == 'flagged'
+    assert duplicates.flag_duplicate(session, original, FINGERPRINTS) is None
+    session.commit()
+
+    assert copy.duplicate_of == original.id
+    assert original.duplicate_of is None
+
+
+def test_similar_post_by_another_user_is_flagged(session, users):
+    alice, bob = users
+    original = add_post(session, alice, FINGERPRINTS, is_approved=True)
+    post = add_post(session, bob, FINGERPRINTS, title='Umbrella found', type='found')
+
+    assert duplicates.flag_duplicate(session, post, FINGERPRINTS) == 'flagged'
+    assert post.duplicate_of == original.id
+
+
+def test_different_image_is_not_flagged(session, users):
+    alice, bob = users
+    add_post(session, alice, FINGERPRINTS)
+    post = add_post(session, bob, OTHER)
+
+    assert duplicates.flag_duplicate(session, post, OTHER) is None
+    assert post.duplicate_of is None